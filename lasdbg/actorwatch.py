@@ -0,0 +1,103 @@
+import struct
+import typing as tp
+
+from lasdbg.context import instance as ctx
+import lasdbg.game as game
+
+
+class ActorEvent(tp.NamedTuple):
+    # "spawn", "despawn" or "moved" (same node, different actor address)
+    kind: str
+    table: str
+    key: str
+    actor: int
+    frame: int
+
+
+class _Tracked(tp.NamedTuple):
+    key: str
+    # First word of the node's key (the id, or the StringView's pointer), to spot reused nodes
+    keyWord: int
+    actor: int
+
+
+class ActorWatcher:
+    """Tracks the actors and mapObjects tables of an ActorSystem between polls.
+
+    Each poll re-reads the table headers and every known node in one batch; only
+    nodes that were not seen before are followed further and have their keys read.
+    A known node whose key changed was freed and reused, and is reported as a
+    despawn of the old key and a spawn of the new one.
+    """
+
+    TABLES = ("actors", "mapObjects")
+
+    def __init__(self, actorSystem: game.ActorSystem,
+                 onEvent: tp.Optional[tp.Callable[[ActorEvent], None]] = None) -> None:
+        self.actorSystem = actorSystem
+        self.onEvent = onEvent
+        self.known: tp.Dict[str, tp.Dict[int, _Tracked]] = {table: {} for table in self.TABLES}
+        self.initialized = False
+
+    def _keys(self, table: str, nodes: tp.List[game.HashTableNodeData]) -> tp.List[str]:
+        if table == "mapObjects":
+            return ["%016x" % struct.unpack_from("<Q", node.data)[0] for node in nodes]
+        # StringView keys: read the characters they point to, one batch for all new nodes
+        ptrs = [struct.unpack_from("<Q", node.data)[0] for node in nodes]
+        names = ctx.read_many([(ptr, 0x40) for ptr in ptrs if ptr])
+        it = iter(names)
+        return [next(it).split(b"\x00", 1)[0].decode(errors="replace") if ptr else "" for ptr in ptrs]
+
+    def _poll(self, table: str, frame: int) -> tp.List[ActorEvent]:
+        hashTable: game.HashTable = getattr(self.actorSystem, table)
+        # The actor pointer is the first word of the value's SharedPtr.
+        ptrOffset = hashTable.valueSize - 0x10
+        known = self.known[table]
+        nodes = hashTable.nodes(seeds=known.keys() if self.initialized else None)
+
+        current: tp.Dict[int, _Tracked] = {}
+        events = []
+        fresh = []
+        for node in nodes:
+            keyWord, = struct.unpack_from("<Q", node.data)
+            actor, = struct.unpack_from("<Q", node.data, ptrOffset)
+            old = known.get(node.addr)
+            if old is not None and old.keyWord != keyWord:
+                events.append(ActorEvent("despawn", table, old.key, old.actor, frame))
+                old = None
+            if old is None:
+                fresh.append(node)
+                continue
+            current[node.addr] = old._replace(actor=actor)
+            if old.actor != actor:
+                events.append(ActorEvent("moved", table, old.key, actor, frame))
+
+        for node, key in zip(fresh, self._keys(table, fresh)):
+            keyWord, = struct.unpack_from("<Q", node.data)
+            actor, = struct.unpack_from("<Q", node.data, ptrOffset)
+            current[node.addr] = _Tracked(key, keyWord, actor)
+            events.append(ActorEvent("spawn", table, key, actor, frame))
+
+        seen = {node.addr for node in nodes}
+        for addr, old in known.items():
+            if addr not in seen:
+                events.append(ActorEvent("despawn", table, old.key, old.actor, frame))
+        self.known[table] = current
+        return events
+
+    def poll(self, frame: int) -> tp.List[ActorEvent]:
+        """Rescan both tables; the first poll reports every existing actor as spawned."""
+        events = []
+        for table in self.TABLES:
+            events += self._poll(table, frame)
+        self.initialized = True
+        if self.onEvent:
+            for event in events:
+                self.onEvent(event)
+        return events
+
+    def reset(self, actorSystem: tp.Optional[game.ActorSystem] = None) -> None:
+        if actorSystem is not None:
+            self.actorSystem = actorSystem
+        self.known = {table: {} for table in self.TABLES}
+        self.initialized = False
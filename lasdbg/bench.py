@@ -0,0 +1,137 @@
+"""Benchmarks against a local fake sys-botbase.
+
+    python -m lasdbg.bench IMAGE [--latency 0.004] [--jitter 0.002] [--bandwidth 2e6] [-o out.json]
+
+IMAGE is anything replay.ReplayBackend accepts (snapshots, captures or a directory
+of them); the fake server serves it as the console's memory. Every benchmark reports
+round trips, bytes and wall time per iteration as JSON.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import typing as tp
+
+import lasdbg.connector as connection
+from lasdbg.context import instance as ctx
+from lasdbg.fakeserver import FakeServer
+from lasdbg.replay import ReplayBackend
+import lasdbg.game as game
+import main as config
+
+
+def _measure(server: FakeServer, run: tp.Callable[[], None], iterations: int) -> tp.Dict[str, tp.Any]:
+    server.resetStats()
+    connection.transportStats.reset()
+    times = []
+    errors = 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        try:
+            run()
+        except Exception:
+            errors += 1
+        times.append(time.perf_counter() - start)
+    stats = server.resetStats()
+    times.sort()
+    return {
+        "iterations": iterations,
+        "errors": errors,
+        "roundTrips": stats.roundTrips / iterations,
+        "bytesIn": stats.bytesIn / iterations,
+        "bytesOut": stats.bytesOut / iterations,
+        "commands": {name: n / iterations for name, n in stats.commands.items()},
+        "wallMean": sum(times) / iterations,
+        "wallMedian": times[len(times) // 2],
+        # As seen by the client, including decoding
+        "transport": connection.transportStats.snapshot()["commands"],
+    }
+
+
+def run(args: argparse.Namespace) -> tp.Dict[str, tp.Any]:
+    server = FakeServer(ReplayBackend(args.image.split(os.pathsep)), latency=args.latency,
+                        jitter=args.jitter, bandwidth=args.bandwidth).start()
+
+    ctx.host, ctx.port = "127.0.0.1", server.port
+    ctx.debug = connection.Debug(ctx.host, ctx.port)
+    ectx = config.EntryContext()
+    entries = config.getEntries()
+
+    def tick() -> None:
+        # As the samplers do: the frame is read in the tick, with the entries.
+        ectx.update()
+        ectx.frm.frameCount
+        for entry in entries:
+            try:
+                entry.get_value(ectx)
+            except Exception:
+                pass
+        ctx.end_tick()
+
+    def traverse() -> None:
+        actsys = game.getFramework().actorSystem.value
+        assert actsys, "no actor system in this image"
+        list(actsys.actors.items())
+        list(actsys.mapObjects.items())
+
+    def readString() -> None:
+        ctx.read_string(ctx.addr(game.Addresses.GlobalSave) + 0x248)
+
+    def dump() -> None:
+        ctx.dump_region(args.dump_addr, args.dump_size)
+
+    # Scattered small reads, as a tick's prefetch makes them
+    ranges = [(args.dump_addr + i * 0x1000, 0x100) for i in range(64)]
+
+    def readMany() -> None:
+        ctx.debug.readMany(ranges)
+
+    benchmarks = {
+        # Twice, so the second run shows the steady state with a prefetch plan.
+        "tick.first": _measure(server, tick, 1),
+        "tick": _measure(server, tick, args.iterations),
+        "hashTable.items": _measure(server, traverse, args.iterations),
+        "read_string": _measure(server, readString, args.iterations),
+        "readMany": _measure(server, readMany, args.iterations),
+        "dump_region": _measure(server, dump, max(1, args.iterations // 10)),
+    }
+    ctx.debug.close()
+
+    # The same tick and reads with every peek in flight at once on one connection
+    ctx.debug = connection.PipelinedDebug(ctx.host, ctx.port)
+    benchmarks["pipelined.tick"] = _measure(server, tick, args.iterations)
+    benchmarks["pipelined.readMany"] = _measure(server, readMany, args.iterations)
+    ctx.debug.close()
+    server.stop()
+
+    return {
+        "config": {"latency": args.latency, "jitter": args.jitter, "bandwidth": args.bandwidth,
+                   "iterations": args.iterations},
+        "benchmarks": benchmarks,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("image")
+    parser.add_argument("--latency", type=float, default=0.004, help="seconds per reply")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random seconds per reply, at most")
+    parser.add_argument("--bandwidth", type=float, default=None, help="reply bytes per second")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--dump-addr", type=lambda s: int(s, 0), default=0)
+    parser.add_argument("--dump-size", type=lambda s: int(s, 0), default=0x400000)
+    parser.add_argument("-o", "--output", help="write the results here instead of stdout")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=1)
+    else:
+        json.dump(results, sys.stdout, indent=1)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,391 @@
+import asyncio
+import binascii
+import collections
+import concurrent.futures
+import contextlib
+import queue
 import socket
+import threading
+import time
+import typing as tp
+
+from lasdbg.metrics import TransportStats
+
+HOST = "192.168.1.93"
+PORT = 6000
+# Seconds to wait for a connection or a reply
+TIMEOUT = 5.0
+# Seconds a whole pipelined call may take, however many replies it waits for
+REPLY_TIMEOUT = 30.0
+
+# Shared by every connection unless one is given its own.
+transportStats = TransportStats()
+
+
+def encodeValue(size: int, value) -> str:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "0x" + bytes(value).hex()
+    if isinstance(value, int):
+        signed = True if value < 0 else False
+        b_value: bytes = value.to_bytes(size, 'little', signed=signed)
+        value = "0x" + b_value.hex()
+    return value
+
+
+def valueBytes(size: int, value) -> bytes:
+    """The bytes encodeValue would poke."""
+    value = encodeValue(size, value)
+    return bytes.fromhex(value[2:] if value.startswith("0x") else value)
+
 
 class Debug(socket.socket):
-    def __init__(self):
+    # sys-botbase rejects command lines longer than this
+    MAX_COMMAND_LENGTH = 0x5000
+    # Larger reads are split into several peeks of at most this many bytes
+    MAX_PEEK_SIZE = 0x8000
+
+    def __init__(self, host: str = HOST, port: int = PORT, stats: tp.Optional[TransportStats] = None,
+                 timeout: tp.Optional[float] = TIMEOUT):
+        self.stats = stats or transportStats
         self.s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.s.connect(("192.168.1.93", 6000))
+        self.s.settimeout(timeout)
+        self.s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        self.s.connect((host, port))
+        self._reply = bytearray(2 * self.MAX_PEEK_SIZE + 1)
+        # Set once a command failed partway; the connection is closed and unusable.
+        self.dead = False
+
+    def close(self) -> None:
+        self.s.close()
+
+    @contextlib.contextmanager
+    def _command(self) -> tp.Iterator[None]:
+        """Close the connection if a command fails partway (e.g. a timeout), since its
+        late reply would otherwise be read as the reply to the next command."""
+        if self.dead:
+            raise ConnectionError("sys-botbase connection was closed after an earlier error")
+        try:
+            yield
+        except BaseException:
+            self.dead = True
+            self.s.close()
+            raise
 
     # Make sure to append "\r\n" to the end of every command to ensure arg are parsed correctly
-    def sendCommand(self, content):
-        content += '\r\n'
-        self.s.sendall(content.encode())
+    def sendCommand(self, content) -> int:
+        data = (content + '\r\n').encode()
+        self.s.sendall(data)
+        return len(data)
+
+    def recvReply(self, size: int) -> memoryview:
+        """Receive exactly `size` bytes into the reusable reply buffer."""
+        if len(self._reply) < size:
+            self._reply = bytearray(size)
+        view = memoryview(self._reply)[:size]
+        received = 0
+        while received < size:
+            n = self.s.recv_into(view[received:])
+            if not n:
+                raise ConnectionError("sys-botbase closed the connection")
+            received += n
+        return view
+
+    def readMemoryInto(self, addr: int, out: memoryview) -> None:
+        size = len(out)
+        for offset in range(0, size, self.MAX_PEEK_SIZE):
+            chunk = min(self.MAX_PEEK_SIZE, size - offset)
+            start = time.perf_counter()
+            with self._command():
+                sent = self.sendCommand(f"peekMain {hex(addr + offset)} {chunk}")
+                reply = self.recvReply((chunk * 2) + 1)
+                received = time.perf_counter()
+                out[offset:offset + chunk] = binascii.a2b_hex(reply[:-1]) # remove trailing \n
+            self.stats.record("peekMain", sent, len(reply), received - start, time.perf_counter() - received)
 
     def readMemory(self, addr: int, size: int):
-        self.sendCommand(f"peekMain {hex(addr)} {size}")
-        data = self.s.recv((size * 2) + 1)[:-1] # remove trailing \n
-        data = str(data, 'utf-8')
-        return bytes.fromhex(data)
+        out = bytearray(size)
+        self.readMemoryInto(addr, memoryview(out))
+        return bytes(out)
+
+    def readMany(self, ranges: tp.Sequence[tp.Tuple[int, int]]) -> tp.List[bytes]:
+        """Read several (addr, size) ranges with as few peekMainMulti commands as possible."""
+        results: tp.List[tp.Optional[bytes]] = [None] * len(ranges)
+        batch: tp.List[int] = []
+        length = total = 0
+        for i, (addr, size) in enumerate(ranges):
+            if size > self.MAX_PEEK_SIZE:
+                results[i] = self.readMemory(addr, size)
+                continue
+            arg = f" {hex(addr)} {size}"
+            if batch and (length + len(arg) > self.MAX_COMMAND_LENGTH or total + size > self.MAX_PEEK_SIZE):
+                self._peekMulti(ranges, batch, results)
+                batch, length, total = [], 0, 0
+            batch.append(i)
+            length += len(arg)
+            total += size
+        if batch:
+            self._peekMulti(ranges, batch, results)
+        return results  # type: ignore
+
+    def _peekMulti(self, ranges: tp.Sequence[tp.Tuple[int, int]], batch: tp.List[int],
+                   results: tp.List[tp.Optional[bytes]]) -> None:
+        if len(batch) == 1:
+            results[batch[0]] = self.readMemory(*ranges[batch[0]])
+            return
+        args = " ".join(f"{hex(ranges[i][0])} {ranges[i][1]}" for i in batch)
+        total = sum(ranges[i][1] for i in batch)
+        start = time.perf_counter()
+        with self._command():
+            sent = self.sendCommand(f"peekMainMulti {args}")
+            reply = self.recvReply((total * 2) + 1)
+            received = time.perf_counter()
+            data = binascii.a2b_hex(reply[:-1])
+        self.stats.record("peekMainMulti", sent, len(reply), received - start, time.perf_counter() - received)
+        offset = 0
+        for i in batch:
+            size = ranges[i][1]
+            results[i] = data[offset:offset + size]
+            offset += size
 
     def writeMemory(self, addr: int, size: int, value):
-        if isinstance(value, int):
-            print(value)
-            signed = True if value < 0 else False
-            b_value: bytes = value.to_bytes(size, 'little', signed=signed)
-            value = "0x" + b_value.hex()
+        start = time.perf_counter()
+        with self._command():
+            sent = self.sendCommand(f"pokeMain {hex(addr)} {encodeValue(size, value)}")
+        self.stats.record("pokeMain", sent, 0, time.perf_counter() - start)
+
+    def writeMany(self, writes: tp.Sequence[tp.Tuple[int, bytes]]) -> None:
+        """Send a pokeMain for every (addr, data) in a single burst."""
+        commands = [f"pokeMain {hex(addr)} {encodeValue(len(data), data)}\r\n".encode() for addr, data in writes]
+        start = time.perf_counter()
+        with self._command():
+            self.s.sendall(b"".join(commands))
+        elapsed = (time.perf_counter() - start) / max(1, len(commands))
+        for command in commands:
+            self.stats.record("pokeMain", len(command), 0, elapsed)
+
+
+class DebugPool:
+    """A fixed set of Debug connections for fetching large regions concurrently."""
+
+    def __init__(self, size: int = 4, host: str = HOST, port: int = PORT, timeout: tp.Optional[float] = TIMEOUT):
+        self.connections = [Debug(host, port, timeout=timeout) for _ in range(size)]
+        self._idle: queue.Queue[Debug] = queue.Queue()
+        for conn in self.connections:
+            self._idle.put(conn)
+        self._executor = concurrent.futures.ThreadPoolExecutor(size, thread_name_prefix="sys-botbase")
+
+    def __len__(self) -> int:
+        return len(self.connections)
+
+    @property
+    def dead(self) -> bool:
+        return any(conn.dead for conn in self.connections)
+
+    @contextlib.contextmanager
+    def acquire(self) -> tp.Iterator[Debug]:
+        conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def readChunks(self, addr: int, size: int, chunkSize: int,
+                   onChunk: tp.Callable[[int, memoryview], None]) -> None:
+        """Fetch [addr, addr + size) in chunks spread over every connection.
+
+        onChunk(offset, data) is called from a worker thread as each chunk arrives.
+        """
+        def fetch(offset: int) -> None:
+            buf = bytearray(min(chunkSize, size - offset))
+            with self.acquire() as conn:
+                conn.readMemoryInto(addr + offset, memoryview(buf))
+            onChunk(offset, memoryview(buf))
+
+        futures = [self._executor.submit(fetch, offset) for offset in range(0, size, chunkSize)]
+        for future in concurrent.futures.as_completed(futures):
+            future.result()
+
+    def close(self) -> None:
+        self._executor.shutdown()
+        for conn in self.connections:
+            conn.close()
+
+
+class AsyncDebug:
+    """sys-botbase client that keeps many commands in flight on one connection.
+
+    sys-botbase answers commands in order and only peeks produce a reply, so each
+    pending peek is matched to the next reply of its expected length.
+    """
+
+    MAX_PEEK_SIZE = Debug.MAX_PEEK_SIZE
+
+    def __init__(self, host: str = HOST, port: int = PORT, stats: tp.Optional[TransportStats] = None,
+                 timeout: tp.Optional[float] = TIMEOUT):
+        self.host = host
+        self.port = port
+        # Bounds connecting and the wait for each next reply; a reply may still take much
+        # longer to arrive after its peek was sent, queued behind many others.
+        self.timeout = timeout
+        self.stats = stats or transportStats
+        self._reader: tp.Optional[asyncio.StreamReader] = None
+        self._writer: tp.Optional[asyncio.StreamWriter] = None
+        # (reply size, future, send time, bytes sent) of every peek awaiting its reply
+        self._pending: tp.Deque[tp.Tuple[int, asyncio.Future, float, int]] = collections.deque()
+        self._replyReady = asyncio.Event()
+        self._replyTask: tp.Optional[asyncio.Task] = None
+        # Why the reply reader stopped; every command after that fails at once.
+        self._error: tp.Optional[BaseException] = None
+
+    @property
+    def dead(self) -> bool:
+        return self._error is not None
+
+    async def connect(self) -> None:
+        self._reader, self._writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        sock = self._writer.get_extra_info("socket")
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._replyTask = asyncio.create_task(self._readReplies())
+
+    async def close(self) -> None:
+        if self._replyTask:
+            self._replyTask.cancel()
+        if self._writer:
+            self._writer.close()
+            with contextlib.suppress(ConnectionError):
+                await self._writer.wait_closed()
+
+    def _fail(self, error: BaseException) -> None:
+        if self._error is None:
+            self._error = error
+        while self._pending:
+            _, future, _, _ = self._pending.popleft()
+            if not future.done():
+                future.set_exception(ConnectionError(f"sys-botbase connection lost: {self._error!r}"))
+
+    async def abort(self, error: BaseException) -> None:
+        """Give up on the connection, e.g. after a reply took too long."""
+        self._fail(error)
+        if self._replyTask:
+            self._replyTask.cancel()
+
+    def _checkAlive(self) -> None:
+        assert self._writer, "not connected"
+        if self._error is not None:
+            raise ConnectionError(f"sys-botbase connection lost: {self._error!r}")
+
+    def _sendCommand(self, content: str) -> int:
+        self._checkAlive()
+        data = (content + '\r\n').encode()
+        self._writer.write(data)
+        return len(data)
+
+    async def _readReplies(self) -> None:
+        assert self._reader
+        try:
+            while True:
+                while not self._pending:
+                    self._replyReady.clear()
+                    await self._replyReady.wait()
+                size, future, start, sent = self._pending[0]
+                reply = await asyncio.wait_for(self._reader.readexactly((size * 2) + 1), self.timeout)
+                self._pending.popleft()
+                received = time.perf_counter()
+                if not future.cancelled():
+                    future.set_result(binascii.a2b_hex(memoryview(reply)[:-1]))
+                # Pipelined peeks also wait for the replies queued ahead of them.
+                self.stats.record("peekMain", sent, len(reply), received - start, time.perf_counter() - received)
+        except BaseException as e:
+            # Whatever stopped the reader (EOF, a timeout, a malformed reply, close()),
+            # no queued peek will get its reply any more.
+            self._fail(e)
+            if not isinstance(e, Exception):
+                raise
+
+    def _peek(self, addr: int, size: int) -> asyncio.Future:
+        self._checkAlive()
+        future = asyncio.get_running_loop().create_future()
+        # Queue before sending so the reply can never arrive ahead of its future.
+        command = f"peekMain {hex(addr)} {size}"
+        self._pending.append((size, future, time.perf_counter(), len(command) + 2))
+        self._replyReady.set()
+        self._sendCommand(command)
+        return future
+
+    async def read(self, addr: int, size: int) -> bytes:
+        futures = [self._peek(addr + offset, min(self.MAX_PEEK_SIZE, size - offset))
+                   for offset in range(0, size, self.MAX_PEEK_SIZE)]
+        return b"".join(await asyncio.gather(*futures))
+
+    async def readMany(self, ranges: tp.Sequence[tp.Tuple[int, int]]) -> tp.List[bytes]:
+        return list(await asyncio.gather(*(self.read(addr, size) for addr, size in ranges)))
+
+    async def writeMany(self, writes: tp.Sequence[tp.Tuple[int, bytes]]) -> None:
+        start = time.perf_counter()
+        sent = [self._sendCommand(f"pokeMain {hex(addr)} {encodeValue(len(data), data)}") for addr, data in writes]
+        assert self._writer
+        await self._writer.drain()
+        elapsed = (time.perf_counter() - start) / max(1, len(sent))
+        for n in sent:
+            self.stats.record("pokeMain", n, 0, elapsed)
+
+    async def write(self, addr: int, size: int, value) -> None:
+        start = time.perf_counter()
+        sent = self._sendCommand(f"pokeMain {hex(addr)} {encodeValue(size, value)}")
+        assert self._writer
+        await self._writer.drain()
+        self.stats.record("pokeMain", sent, 0, time.perf_counter() - start)
+
+
+class PipelinedDebug:
+    """Synchronous facade over AsyncDebug, usable anywhere Debug is (e.g. as Context.debug).
+
+    The event loop runs on a background thread; readMany sends every peek before
+    waiting for the first reply, so a batch costs about one round trip.
+    """
+
+    def __init__(self, host: str = HOST, port: int = PORT, stats: tp.Optional[TransportStats] = None,
+                 timeout: tp.Optional[float] = TIMEOUT, replyTimeout: tp.Optional[float] = REPLY_TIMEOUT):
+        self.replyTimeout = replyTimeout
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="sys-botbase", daemon=True)
+        self._thread.start()
+        self.client = AsyncDebug(host, port, stats, timeout)
+        self.stats = self.client.stats
+        self._run(self.client.connect())
+
+    @property
+    def dead(self) -> bool:
+        return self.client.dead
+
+    def _run(self, coro: tp.Coroutine):
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(self.replyTimeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            error = TimeoutError(f"no reply from sys-botbase within {self.replyTimeout}s")
+            asyncio.run_coroutine_threadsafe(self.client.abort(error), self.loop).result()
+            raise error from None
+
+    def submit(self, coro: tp.Coroutine) -> concurrent.futures.Future:
+        """Schedule a coroutine on the client's loop without waiting for it."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def readMemory(self, addr: int, size: int) -> bytes:
+        return self._run(self.client.read(addr, size))
+
+    def readMany(self, ranges: tp.Sequence[tp.Tuple[int, int]]) -> tp.List[bytes]:
+        return self._run(self.client.readMany(ranges))
+
+    def writeMemory(self, addr: int, size: int, value) -> None:
+        self._run(self.client.write(addr, size, value))
+
+    def writeMany(self, writes: tp.Sequence[tp.Tuple[int, bytes]]) -> None:
+        self._run(self.client.writeMany(writes))
 
-        self.sendCommand(f"pokeMain {hex(addr)} {value}")
+    def close(self) -> None:
+        self._run(self.client.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
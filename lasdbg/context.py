@@ -1,5 +1,13 @@
 import lasdbg.connector as connection
+from lasdbg.replay import RecordingBackend, ReplayBackend
+import bisect
+import collections
+import contextlib
+import dataclasses
+import os
+import threading
 import struct
+import typing as tp
 
 
 # def get_application_pid(device: pytwib.ITwibDeviceInterface) -> int:
@@ -11,8 +19,37 @@ import struct
 
 _NUL_CHR = b'\x00'
 
+
+def merge_ranges(ranges: tp.Iterable[tp.Tuple[int, int]], gap: int = 0) -> tp.List[tp.Tuple[int, int]]:
+    """Merge (addr, size) ranges that overlap or are at most `gap` bytes apart."""
+    merged: tp.List[tp.List[int]] = []
+    for addr, size in sorted(ranges):
+        end = addr + size
+        if merged and addr <= merged[-1][1] + gap:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([addr, end])
+    return [(start, end - start) for start, end in merged]
+
+
+@dataclasses.dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    bypassed: int = 0
+    evicted: int = 0
+
+
+@dataclasses.dataclass
+class PointerStats:
+    resolved: int = 0
+    # Dereferences answered from the pointer cache without reading memory.
+    skipped: int = 0
+    invalidations: int = 0
+
+
 class Context:
-    def __init__(self) -> None:
+    def __init__(self, debug=None) -> None:
         # self.client: pytwib.Client = pytwib.GetClient()
         # self.device: pytwib.ITwibDeviceInterface = pytwib.GetDeviceInterface(self.client)
         # pid = get_application_pid(self.device)
@@ -20,21 +57,314 @@ class Context:
         # self.base = self.debug.GetTargetEntry()
 
         self.base = 0xC88 #0x710143109f
-        self.debug = connection.Debug()
+        # Any object with readMemory/readMany/writeMemory, e.g. connection.PipelinedDebug.
+        # Without one, connect() picks a backend on first use.
+        self._debug = debug
+        # sys-botbase endpoint and socket timeout in seconds (None blocks forever)
+        self.host = os.environ.get("LASDBG_HOST", connection.HOST)
+        self.port = int(os.environ.get("LASDBG_PORT", connection.PORT))
+        timeout = os.environ.get("LASDBG_TIMEOUT")
+        self.timeout: tp.Optional[float] = float(timeout) if timeout else connection.TIMEOUT
         # self.ingest_events()
 
+        # Reads recorded during a tick are prefetched at the start of the next one as
+        # runs of whole pages; runs at most this many pages apart are fetched by the
+        # same peekMain, pages in between included. (Counted in pages since aligned
+        # runs are always whole pages apart.)
+        self.coalesce_pages = 1
+        self._plan: tp.Optional[tp.Set[tp.Tuple[int, int]]] = None
+
+        # Memory is cached in pages for the duration of one tick (sampling epoch).
+        self.page_size = 0x100
+        self.cache_budget = 0x40000
+        self._pages: tp.OrderedDict[int, bytes] = collections.OrderedDict()
+        self._ticking = False
+        self.cache_stats = CacheStats()
+        self.tick_stats = CacheStats()
+        self.last_tick_stats = CacheStats()
+
+        # Connections used by dump_region, opened on first use.
+        self.dump_connections = 4
+        self.dump_chunk_size = 0x40000
+        self._pool: tp.Optional[connection.DebugPool] = None
+
+        # Writes buffered by batch(), flushed when the outermost batch ends.
+        self._batch: tp.Optional[tp.List[tp.Tuple[int, bytes]]] = None
+        # Merged writes are split into pokes of at most this many bytes.
+        self.max_poke_size = 0x1000
+
+        # Resolved pointers, kept across ticks until the pointer generation changes.
+        self._pointers: tp.Dict[int, int] = {}
+        self._pointer_generation: tp.Optional[tp.Hashable] = None
+        # Until a generation is set nothing would ever invalidate cached pointers.
+        self._pointer_generation_set = False
+        self.pointer_stats = PointerStats()
+
+    @property
+    def debug(self):
+        # A backend whose connection failed mid-command is replaced by a fresh one.
+        if self._debug is not None and getattr(self._debug, "dead", False):
+            self._debug.close()
+            self._debug = None
+            self.invalidate()
+            self.invalidate_pointers()
+        if self._debug is None:
+            self._debug = self.connect()
+        return self._debug
+
+    @debug.setter
+    def debug(self, debug) -> None:
+        self._debug = debug
+
+    def connect(self):
+        """The backend used when none was given: a replay if LASDBG_REPLAY names snapshots
+        or captures (os.pathsep separated), otherwise sys-botbase at host:port, recorded
+        to LASDBG_RECORD if set."""
+        replay = os.environ.get("LASDBG_REPLAY")
+        if replay:
+            return ReplayBackend(replay.split(os.pathsep))
+        debug = connection.Debug(self.host, self.port, timeout=self.timeout)
+        record = os.environ.get("LASDBG_RECORD")
+        if record:
+            return RecordingBackend(debug, record)
+        return debug
+
     def addr(self, ea: int) -> int:
         return ea - 0x7100000000 - self.base
 
     def to_ida(self, addr: int) -> int:
         return addr + 0x7100000000 + self.base
 
-    def read(self, addr: int, size: int) -> bytes:
-        return self.debug.readMemory(addr, size)
+    def begin_tick(self) -> None:
+        # Replay backends advance to the next recorded tick; recording ones mark it.
+        on_tick = getattr(self.debug, "beginTick", None)
+        if on_tick is not None:
+            on_tick()
+        self.invalidate()
+        self._ticking = True
+        self.last_tick_stats = self.tick_stats
+        self.tick_stats = CacheStats()
+
+        ps = self.page_size
+        pages = ((addr // ps, (addr + size - 1) // ps - addr // ps + 1) for addr, size in self._plan or ())
+        self._plan = set()
+        runs = merge_ranges(pages, self.coalesce_pages)
+        for page, data in self._fetch_pages(runs).items():
+            self._insert_page(page, data)
+
+    def end_tick(self) -> None:
+        self._ticking = False
+        self.invalidate()
+
+    def invalidate(self, addr: tp.Optional[int] = None, size: int = 0) -> None:
+        """Drop cached pages overlapping [addr, addr + size), or every page if addr is None."""
+        if addr is None:
+            self._pages.clear()
+            return
+        ps = self.page_size
+        for page in range(addr // ps, (addr + size - 1) // ps + 1):
+            self._pages.pop(page, None)
+
+    def _fetch_pages(self, runs: tp.List[tp.Tuple[int, int]]) -> tp.Dict[int, bytes]:
+        """Fetch (first page, page count) runs in one batched request."""
+        ps = self.page_size
+        fetched: tp.Dict[int, bytes] = {}
+        if not runs:
+            return fetched
+        blocks = self.debug.readMany([(first * ps, count * ps) for first, count in runs])
+        for (first, count), data in zip(runs, blocks):
+            for i in range(count):
+                fetched[first + i] = data[i * ps:(i + 1) * ps]
+        return fetched
+
+    def _insert_page(self, page: int, data: bytes) -> None:
+        self._pages[page] = data
+        self._pages.move_to_end(page)
+        while len(self._pages) * self.page_size > self.cache_budget:
+            self._pages.popitem(last=False)
+            self.cache_stats.evicted += 1
+            self.tick_stats.evicted += 1
+
+    def _count(self, field: str) -> None:
+        setattr(self.cache_stats, field, getattr(self.cache_stats, field) + 1)
+        setattr(self.tick_stats, field, getattr(self.tick_stats, field) + 1)
+
+    def read(self, addr: int, size: int, volatile: bool = False) -> bytes:
+        if not self._ticking or volatile:
+            if self._ticking:
+                self._count("bypassed")
+            return self.debug.readMemory(addr, size)
+
+        self._plan.add((addr, size))  # type: ignore
+        ps = self.page_size
+        first, last = addr // ps, (addr + size - 1) // ps
+        pages = range(first, last + 1)
+        missing = [page for page in pages if page not in self._pages]
+        if not missing:
+            self._count("hits")
+            for page in pages:
+                self._pages.move_to_end(page)
+            data = b"".join(self._pages[page] for page in pages)
+        else:
+            self._count("misses")
+            runs = merge_ranges((page, 1) for page in missing)
+            fetched = self._fetch_pages(runs)
+            data = b"".join(fetched[page] if page in fetched else self._pages[page] for page in pages)
+            for page, page_data in fetched.items():
+                self._insert_page(page, page_data)
+        return data[addr - first * ps:addr - first * ps + size]
+
+    def read_many(self, ranges: tp.Sequence[tp.Tuple[int, int]], volatile: bool = False) -> tp.List[bytes]:
+        """Read several (addr, size) ranges, fetching everything not cached in one batch."""
+        if not self._ticking or volatile:
+            if self._ticking:
+                self._count("bypassed")
+            return self.debug.readMany(ranges)
+
+        ps = self.page_size
+        spans = []
+        missing: tp.Set[int] = set()
+        for addr, size in ranges:
+            self._plan.add((addr, size))  # type: ignore
+            pages = range(addr // ps, (addr + size - 1) // ps + 1)
+            spans.append(pages)
+            absent = [page for page in pages if page not in self._pages]
+            missing.update(absent)
+            self._count("misses" if absent else "hits")
+
+        fetched = self._fetch_pages(merge_ranges((page, 1) for page in missing))
+        results = []
+        for (addr, size), pages in zip(ranges, spans):
+            data = b"".join(fetched[page] if page in fetched else self._pages[page] for page in pages)
+            offset = addr - pages.start * ps
+            results.append(data[offset:offset + size])
+        for page, page_data in fetched.items():
+            self._insert_page(page, page_data)
+        return results
 
     def write(self, addr: int, size: int, data=None):
+        if self._batch is not None:
+            self._batch.append((addr, connection.valueBytes(size, data)))
+            return
+        self._forget(addr, size)
         self.debug.writeMemory(addr, size, data)
 
+    def _forget(self, addr: int, size: int) -> None:
+        self.invalidate(addr, size)
+        if self._pointers:
+            for slot in range(addr - 7, addr + size):
+                self._pointers.pop(slot, None)
+
+    @contextlib.contextmanager
+    def batch(self) -> tp.Iterator[None]:
+        """Buffer writes and send them as merged pokes in one burst when the block ends.
+
+        Overlapping and adjacent writes become one pokeMain, later writes winning.
+        Reads inside the block do not see the buffered writes. Nothing is written
+        if the block raises, and nested batches are flushed by the outermost one.
+        """
+        if self._batch is not None:
+            yield
+            return
+        self._batch = []
+        try:
+            yield
+            writes = self._batch
+        finally:
+            self._batch = None
+        self.flush_writes(writes)
+
+    def flush_writes(self, writes: tp.Sequence[tp.Tuple[int, bytes]]) -> None:
+        """Write every (addr, data) as merged pokes, in one burst if the backend can."""
+        # Union of the written ranges, then each write applied in issue order so later ones win.
+        runs = merge_ranges(((addr, len(data)) for addr, data in writes))
+        starts = [addr for addr, _ in runs]
+        merged = [(addr, bytearray(size)) for addr, size in runs]
+        for addr, data in writes:
+            start, buf = merged[bisect.bisect_right(starts, addr) - 1]
+            buf[addr - start:addr - start + len(data)] = data
+
+        pokes = [(start + offset, bytes(buf[offset:offset + self.max_poke_size]))
+                 for start, buf in merged for offset in range(0, len(buf), self.max_poke_size)]
+        for addr, data in pokes:
+            self._forget(addr, len(data))
+        write_many = getattr(self.debug, "writeMany", None)
+        if write_many is not None:
+            write_many(pokes)
+        else:
+            for addr, data in pokes:
+                self.debug.writeMemory(addr, len(data), data)
+
+    def read_ptr(self, addr: int) -> int:
+        """read_u64 for pointer slots, cached until the pointer generation changes.
+
+        Nothing is cached before set_pointer_generation has been called.
+        """
+        ptr = self._pointers.get(addr)
+        if ptr is not None:
+            self.pointer_stats.skipped += 1
+            return ptr
+        ptr = self.read_u64(addr)
+        self.pointer_stats.resolved += 1
+        # Null pointers are not cached so objects that appear later are picked up.
+        if ptr and self._pointer_generation_set:
+            self._pointers[addr] = ptr
+        return ptr
+
+    def set_pointer_generation(self, generation: tp.Hashable) -> None:
+        """Invalidate cached pointers if `generation` differs from the last one set."""
+        if generation != self._pointer_generation or not self._pointer_generation_set:
+            self.invalidate_pointers()
+            self._pointer_generation = generation
+            self._pointer_generation_set = True
+
+    def invalidate_pointers(self) -> None:
+        if self._pointers:
+            self.pointer_stats.invalidations += 1
+        self._pointers.clear()
+
+    def dump_region(self, addr: int, size: int, path: tp.Optional[str] = None) -> tp.Optional[bytearray]:
+        """Read a large region concurrently over several connections.
+
+        The data is returned as one buffer, or streamed into the file at `path`.
+        Backends other than a live sys-botbase connection (replays, recordings) are
+        read through one chunk at a time, so dumps replay and get recorded too.
+        """
+        debug = self.debug
+        if isinstance(debug, connection.Debug):
+            if self._pool is None or len(self._pool) != self.dump_connections or self._pool.dead:
+                if self._pool is not None:
+                    self._pool.close()
+                self._pool = connection.DebugPool(self.dump_connections, self.host, self.port, self.timeout)
+            read_chunks = self._pool.readChunks
+        else:
+            def read_chunks(addr: int, size: int, chunk_size: int,
+                            on_chunk: tp.Callable[[int, memoryview], None]) -> None:
+                for offset in range(0, size, chunk_size):
+                    on_chunk(offset, memoryview(debug.readMemory(addr + offset, min(chunk_size, size - offset))))
+
+        if path is None:
+            out = bytearray(size)
+            view = memoryview(out)
+
+            def store(offset: int, data: memoryview) -> None:
+                view[offset:offset + len(data)] = data
+
+            read_chunks(addr, size, self.dump_chunk_size, store)
+            return out
+
+        lock = threading.Lock()
+        with open(path, "wb") as f:
+            f.truncate(size)
+
+            def write(offset: int, data: memoryview) -> None:
+                with lock:
+                    f.seek(offset)
+                    f.write(data)
+
+            read_chunks(addr, size, self.dump_chunk_size, write)
+        return None
+
     # def break_process(self) -> None:
     #     self.debug.breakProcess()
     #     # event = self.debug.GetDebugEvent()
@@ -52,26 +382,26 @@ class Context:
     #     #         return
     #     #     print(f"got event type {event.event_type}")
 
-    def read_bool(self, addr: int) -> bool:
-        return self.read_u8(addr) != 0
+    def read_bool(self, addr: int, volatile: bool = False) -> bool:
+        return self.read_u8(addr, volatile) != 0
 
-    def read_u8(self, addr: int) -> int:
-        return struct.unpack("B", self.read(addr, 1))[0]
+    def read_u8(self, addr: int, volatile: bool = False) -> int:
+        return struct.unpack("B", self.read(addr, 1, volatile))[0]
 
-    def read_u16(self, addr: int) -> int:
-        return struct.unpack("<H", self.read(addr, 2))[0]
+    def read_u16(self, addr: int, volatile: bool = False) -> int:
+        return struct.unpack("<H", self.read(addr, 2, volatile))[0]
 
-    def read_u32(self, addr: int) -> int:
-        return struct.unpack("<I", self.read(addr, 4))[0]
+    def read_u32(self, addr: int, volatile: bool = False) -> int:
+        return struct.unpack("<I", self.read(addr, 4, volatile))[0]
 
-    def read_s32(self, addr: int) -> int:
-        return struct.unpack("<i", self.read(addr, 4))[0]
+    def read_s32(self, addr: int, volatile: bool = False) -> int:
+        return struct.unpack("<i", self.read(addr, 4, volatile))[0]
 
-    def read_u64(self, addr: int) -> int:
-        return struct.unpack("<Q", self.read(addr, 8))[0]
+    def read_u64(self, addr: int, volatile: bool = False) -> int:
+        return struct.unpack("<Q", self.read(addr, 8, volatile))[0]
 
-    def read_f32(self, addr: int) -> float:
-        return struct.unpack("<f", self.read(addr, 4))[0]
+    def read_f32(self, addr: int, volatile: bool = False) -> float:
+        return struct.unpack("<f", self.read(addr, 4, volatile))[0]
 
     # def read_string(self, addr: int) -> str:
     #     b = self.read(addr, 0x40)
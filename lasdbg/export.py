@@ -0,0 +1,145 @@
+"""Headless sampling of entries, streamed as JSON Lines or CSV.
+
+    python -m lasdbg.export [--entries trace] [--rate 10] [--format csv] [-o out.csv] [NAME ...]
+
+Entries are taken from main.py: getEntries() (display strings) or getTraceEntries()
+(numbers). Give entry names to export only those. Every row carries the frame and
+a wall-clock timestamp.
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+import typing as tp
+
+from lasdbg.context import instance as ctx
+from lasdbg.sampler import FrameSampler, Sample
+import lasdbg.game as game
+import main as config
+
+
+def samples(ectx: tp.Any, entries: tp.Sequence[tp.Any], rate: float = 10.0, frameSync: bool = False,
+            count: tp.Optional[int] = None) -> tp.Iterator[Sample]:
+    """Sample every entry up to `rate` times per second; values that fail are None.
+
+    With frameSync, samples are only taken when the game frame has advanced. A sample
+    that fails as a whole (e.g. the connection dropped) is skipped and reported on
+    stderr; sampling goes on at the next deadline.
+    """
+    def sample() -> tp.Tuple[int, tp.Tuple[tp.Any, ...]]:
+        try:
+            ectx.update()
+            frame = ectx.frm.frameCount
+            values = []
+            for entry in entries:
+                try:
+                    values.append(entry.get_value(ectx))
+                except Exception:
+                    values.append(None)
+            return frame, tuple(values)
+        finally:
+            ctx.end_tick()
+
+    sampler = FrameSampler(lambda: game.getFramework().pollFrameCount(), sample, frameSync)
+    interval = 1.0 / rate
+    deadline = time.perf_counter()
+    taken = 0
+    # Consecutive failed samples; only the first of a run is logged.
+    failures = 0
+    while count is None or taken < count:
+        try:
+            s = sampler.poll()
+        except Exception as e:
+            ctx.end_tick()
+            if not failures:
+                print(f"sampling failed: {e!r}", file=sys.stderr)
+            failures += 1
+            s = None
+        else:
+            if failures:
+                print(f"sampling recovered after {failures} failed samples", file=sys.stderr)
+                failures = 0
+        if s is not None:
+            taken += 1
+            yield s
+        deadline += interval
+        delay = deadline - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            # Too slow for the rate; don't try to catch up.
+            deadline = time.perf_counter()
+
+
+def rows(samples: tp.Iterable[Sample], names: tp.Sequence[str]) -> tp.Iterator[tp.Dict[str, tp.Any]]:
+    # Sample timestamps are perf_counter based; rows get wall-clock time.
+    offset = time.time() - time.perf_counter()
+    for s in samples:
+        row = {"frame": s.frame, "time": round(s.timestamp + offset, 6)}
+        row.update(zip(names, s.values))
+        yield row
+
+
+def write(rows: tp.Iterable[tp.Dict[str, tp.Any]], out: tp.TextIO, format: str = "jsonl",
+          names: tp.Sequence[str] = (), flushInterval: float = 1.0) -> int:
+    """Write rows to out, flushing at most every flushInterval seconds; returns how many were written."""
+    if format == "csv":
+        writer = csv.DictWriter(out, ["frame", "time", *names])
+        writer.writeheader()
+        emit = writer.writerow
+    elif format == "jsonl":
+        def emit(row: tp.Dict[str, tp.Any]) -> None:
+            out.write(json.dumps(row, separators=(",", ":")) + "\n")
+    else:
+        raise ValueError(f"unknown format {format!r}; expected jsonl or csv")
+
+    n = 0
+    lastFlush = time.perf_counter()
+    try:
+        for row in rows:
+            emit(row)
+            n += 1
+            now = time.perf_counter()
+            if now - lastFlush >= flushInterval:
+                out.flush()
+                lastFlush = now
+    finally:
+        out.flush()
+    return n
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("names", nargs="*", help="entries to export (default: all)")
+    parser.add_argument("--entries", choices=("display", "trace"), default="display")
+    parser.add_argument("--rate", type=float, default=10.0, help="samples per second, at most")
+    parser.add_argument("--frame-sync", action="store_true", help="skip samples on an unchanged frame")
+    parser.add_argument("--count", type=int, help="stop after this many samples")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument("--flush", type=float, default=1.0, help="seconds between flushes")
+    parser.add_argument("-o", "--output", help="write here instead of stdout")
+    args = parser.parse_args()
+
+    entries = config.getTraceEntries() if args.entries == "trace" else config.getEntries()
+    if args.names:
+        known = {entry.name: entry for entry in entries}
+        missing = [name for name in args.names if name not in known]
+        if missing:
+            parser.error(f"unknown entries: {', '.join(missing)}")
+        entries = [known[name] for name in args.names]
+    names = [entry.name for entry in entries]
+
+    stream = rows(samples(config.EntryContext(), entries, args.rate, args.frame_sync, args.count), names)
+    out = open(args.output, "w", buffering=1 << 16, newline="") if args.output else sys.stdout
+    try:
+        write(stream, out, args.format, names, args.flush)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import binascii
+import collections
+import dataclasses
+import heapq
+import queue
+import random
+import socket
+import socketserver
+import threading
+import time
+import typing as tp
+
+
+@dataclasses.dataclass
+class ServerStats:
+    commands: tp.Counter[str] = dataclasses.field(default_factory=collections.Counter)
+    bytesIn: int = 0
+    bytesOut: int = 0
+
+    @property
+    def roundTrips(self) -> int:
+        # pokeMain has no reply, so it costs no round trip.
+        return sum(n for name, n in self.commands.items() if name != "pokeMain")
+
+    def asDict(self) -> tp.Dict[str, tp.Any]:
+        return {"roundTrips": self.roundTrips, "commands": dict(self.commands),
+                "bytesIn": self.bytesIn, "bytesOut": self.bytesOut}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "FakeServer"
+
+    def setup(self) -> None:
+        super().setup()
+        # Replies are written one by one as they fall due; don't let Nagle hold them back.
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            self.server.submit(line, self.wfile)
+
+
+class FakeServer(socketserver.ThreadingTCPServer):
+    """A local stand-in for sys-botbase serving peekMain, peekMainMulti and pokeMain.
+
+    Memory is any object with readMemory/writeMemory, e.g. a replay.ReplayBackend.
+    peekMulti is accepted as an alias of peekMainMulti, since addresses here are
+    always main-relative.
+
+    Like sys-botbase, one worker executes the commands of every connection in the
+    order they arrive. Each reply is sent `latency` seconds (plus up to `jitter`)
+    after its command was received, without holding up the commands behind it, so
+    pipelined commands overlap their latency as they would over a network. With
+    `bandwidth` set, replies also share one link of that many bytes per second.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, memory, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 jitter: float = 0.0, bandwidth: tp.Optional[float] = None) -> None:
+        super().__init__((host, port), _Handler)
+        self.memory = memory
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.stats = ServerStats()
+        self._lock = threading.Lock()
+        self._thread: tp.Optional[threading.Thread] = None
+        # (receive time, line, connection) of every command not executed yet; None stops the worker
+        self._commands: "queue.Queue[tp.Optional[tp.Tuple[float, bytes, tp.BinaryIO]]]" = queue.Queue()
+        # (send time, sequence, connection, reply) heap of replies not sent yet
+        self._replies: tp.List[tp.Tuple[float, int, tp.BinaryIO, bytes]] = []
+        self._replyReady = threading.Condition()
+        self._sequence = 0
+        # When the link is done sending the last scheduled reply
+        self._linkFree = 0.0
+        # Send time of the last reply scheduled on each connection, which keeps replies in order
+        self._lastSend: tp.Dict[int, float] = {}
+        self._stopping = False
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> "FakeServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-sys-botbase", daemon=True)
+        self._thread.start()
+        threading.Thread(target=self._execute, name="fake-sys-botbase-worker", daemon=True).start()
+        threading.Thread(target=self._sendReplies, name="fake-sys-botbase-link", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        self._commands.put(None)
+        with self._replyReady:
+            self._stopping = True
+            self._replyReady.notify()
+
+    def resetStats(self) -> ServerStats:
+        with self._lock:
+            stats, self.stats = self.stats, ServerStats()
+        return stats
+
+    def submit(self, line: bytes, out: tp.BinaryIO) -> None:
+        """Queue a command received on the connection writing to `out`."""
+        self._commands.put((time.perf_counter(), line, out))
+
+    def _execute(self) -> None:
+        while True:
+            item = self._commands.get()
+            if item is None:
+                return
+            received, line, out = item
+            try:
+                reply = self.handleCommand(line)
+            except Exception:
+                # sys-botbase ignores commands it cannot run.
+                continue
+            if reply is not None:
+                self._schedule(received, out, reply + b"\n")
+
+    def _schedule(self, received: float, out: tp.BinaryIO, data: bytes) -> None:
+        due = received + self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if self.bandwidth:
+            due = max(due, self._linkFree) + len(data) / self.bandwidth
+            self._linkFree = due
+        due = max(due, self._lastSend.get(id(out), 0.0))
+        self._lastSend[id(out)] = due
+        with self._replyReady:
+            heapq.heappush(self._replies, (due, self._sequence, out, data))
+            self._sequence += 1
+            self._replyReady.notify()
+
+    def _sendReplies(self) -> None:
+        while True:
+            with self._replyReady:
+                while not self._replies and not self._stopping:
+                    self._replyReady.wait()
+                if self._stopping:
+                    return
+                due, _, out, data = self._replies[0]
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    self._replyReady.wait(delay)
+                    continue
+                heapq.heappop(self._replies)
+            try:
+                out.write(data)
+                out.flush()
+            except (OSError, ValueError):
+                # The client went away before its reply was due.
+                pass
+
+    def handleCommand(self, line: bytes) -> tp.Optional[bytes]:
+        """Run one command; returns its reply without the trailing newline, if it has one."""
+        args = line.decode().split()
+        if not args:
+            return None
+        name, args = args[0], args[1:]
+        reply = None
+        with self._lock:
+            if name == "peekMain":
+                reply = binascii.b2a_hex(self.memory.readMemory(int(args[0], 0), int(args[1], 0)))
+            elif name in ("peekMainMulti", "peekMulti"):
+                reply = b"".join(binascii.b2a_hex(self.memory.readMemory(int(addr, 0), int(size, 0)))
+                                 for addr, size in zip(args[::2], args[1::2]))
+            elif name == "pokeMain":
+                value = args[1][2:] if args[1].startswith("0x") else args[1]
+                data = bytes.fromhex(value)
+                self.memory.writeMemory(int(args[0], 0), len(data), data)
+            else:
+                raise ValueError(f"unsupported command {name!r}")
+            self.stats.commands[name] += 1
+            self.stats.bytesIn += len(line)
+            if reply is not None:
+                self.stats.bytesOut += len(reply) + 1
+        return reply
@@ -0,0 +1,81 @@
+import bisect
+import struct
+import typing as tp
+
+from lasdbg.context import instance as ctx, merge_ranges
+from lasdbg.watch import TYPES, layoutField, resolvePath
+import lasdbg.game as game
+
+
+class Frozen(tp.NamedTuple):
+    name: str
+    addr: int
+    # The bytes the value is held at
+    data: bytes
+
+
+class Freezer:
+    """Holds values in place: each poll reads every frozen value with one batched read
+    and writes back only the ones that drifted, merged into as few pokes as possible.
+
+    How often poll() is called sets the enforcement rate.
+    """
+
+    def __init__(self, gap: int = 0x40) -> None:
+        # Frozen values closer than this many bytes are read as one range.
+        self.gap = gap
+        self.frozen: tp.Dict[str, Frozen] = {}
+        # Per frozen value: index of its range and offset within it
+        self._ranges: tp.List[tp.Tuple[int, int]] = []
+        self._slots: tp.List[tp.Tuple[int, int]] = []
+        # Number of values written back, over every poll
+        self.corrections = 0
+
+    def _rebuild(self) -> None:
+        self._ranges = merge_ranges(((f.addr, len(f.data)) for f in self.frozen.values()), self.gap)
+        starts = [addr for addr, _ in self._ranges]
+        self._slots = []
+        for f in self.frozen.values():
+            i = bisect.bisect_right(starts, f.addr) - 1
+            self._slots.append((i, f.addr - starts[i]))
+
+    def freeze(self, addr: int, type: str, value, name: tp.Optional[str] = None) -> Frozen:
+        """Hold a value of one of the watch TYPES (or any struct format) at addr; replaces any freeze of the same name."""
+        fmt = TYPES.get(type, type)
+        s = struct.Struct(fmt if fmt[0] in "<>=!@" else "<" + fmt)
+        data = s.pack(*value) if isinstance(value, tuple) else s.pack(value)
+        f = Frozen(name or f"{addr:#x}", addr, data)
+        self.frozen[f.name] = f
+        self._rebuild()
+        return f
+
+    def freezeField(self, obj: game.Structure, field: str, value, name: tp.Optional[str] = None) -> Frozen:
+        f = layoutField(obj, field)
+        return self.freeze(obj.addr + f.offset, f.fmt, value, name or f"{type(obj).__name__}.{field}")
+
+    def freezePath(self, root: tp.Any, path: str, value) -> Frozen:
+        """Hold a dotted path such as "save.inventory.health" (see watch.resolvePath)."""
+        obj, field = resolvePath(root, path)
+        return self.freezeField(obj, field.name, value, path)
+
+    def unfreeze(self, name: str) -> None:
+        del self.frozen[name]
+        self._rebuild()
+
+    def clear(self) -> None:
+        self.frozen.clear()
+        self._rebuild()
+
+    def poll(self) -> tp.List[Frozen]:
+        """Restore every drifted value; returns the ones that were written."""
+        if not self.frozen:
+            return []
+        blocks = ctx.read_many(self._ranges, volatile=True)
+        drifted = [f for f, (i, offset) in zip(self.frozen.values(), self._slots)
+                   if blocks[i][offset:offset + len(f.data)] != f.data]
+        if drifted:
+            with ctx.batch():
+                for f in drifted:
+                    ctx.write(f.addr, len(f.data), f.data)
+            self.corrections += len(drifted)
+        return drifted
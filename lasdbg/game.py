@@ -1,4 +1,5 @@
 from __future__ import annotations
+import collections
 import enum
 import typing as tp
 import struct
@@ -19,10 +20,84 @@ def getFramework() -> Framework:
     return Framework(ctx.addr(Addresses.FrameworkPtr))
 
 
+def pointerGeneration() -> tp.Hashable:
+    """Cheap key that changes whenever cached pointer chains may have gone stale."""
+    frm = getFramework()
+    x248 = GlobalSave(ctx.addr(Addresses.GlobalSave)).eventFlags.x248
+    # actorSystem, gameState and player SharedPtrs
+    return ctx.read(frm.addr + 0x498, 0x30), x248.zoneId, x248.levelName
+
+
+class Field(tp.NamedTuple):
+    name: str
+    offset: int
+    # struct format without byte order, e.g. "B", "<3f" is written "3f", strings "64s"
+    fmt: str
+
+
+def _decodeString(data: bytes) -> str:
+    return data.split(b"\x00", 1)[0].decode(errors="replace")
+
+
+class Layout:
+    """Fields of a Structure compiled into one struct.Struct spanning all of them."""
+
+    def __init__(self, name: str, fields: tp.Iterable[Field]) -> None:
+        self.fields = tuple(sorted(fields, key=lambda field: field.offset))
+        self.start = self.fields[0].offset if self.fields else 0
+        fmt = "<"
+        pos = self.start
+        index = 0
+        self._items: tp.List[tp.Tuple[int, int, bool]] = []
+        for field in self.fields:
+            if field.offset < pos:
+                raise ValueError(f"{name}.{field.name} overlaps the previous field")
+            if field.offset > pos:
+                fmt += f"{field.offset - pos}x"
+            fmt += field.fmt
+            size = struct.calcsize("<" + field.fmt)
+            count = len(struct.unpack("<" + field.fmt, bytes(size)))
+            self._items.append((index, count, field.fmt.endswith("s")))
+            index += count
+            pos = field.offset + size
+        self.struct = struct.Struct(fmt)
+        self.record = collections.namedtuple(f"{name}Snapshot", [field.name for field in self.fields])  # type: ignore
+        self._flat = all(count == 1 and not isString for _, count, isString in self._items)
+
+    @property
+    def size(self) -> int:
+        return self.struct.size
+
+    def unpack(self, data: bytes) -> tp.Any:
+        values = self.struct.unpack(data)
+        if self._flat:
+            return self.record._make(values)
+        return self.record._make(
+            _decodeString(values[i]) if isString else values[i] if count == 1 else values[i:i + count]
+            for i, count, isString in self._items)
+
+
 class Structure:
+    # Declared fields (name, offset, format); subclasses extend their parent's layout.
+    fields: tp.ClassVar[tp.Sequence[Field]] = ()
+    layout: tp.ClassVar[tp.Optional[Layout]] = None
+
     def __init__(self, addr: int) -> None:
         self.addr = addr
 
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        if "fields" in cls.__dict__:
+            inherited = cls.layout.fields if cls.layout else ()
+            cls.layout = Layout(cls.__name__, inherited + tuple(cls.fields))
+
+    def snapshot(self) -> tp.Any:
+        """Read every declared field with one read and one unpack."""
+        layout = self.layout
+        if layout is None:
+            raise TypeError(f"{type(self).__name__} has no field layout")
+        return layout.unpack(ctx.read(self.addr + layout.start, layout.size))
+
 
 class VirtualStructure(Structure):
     @property
@@ -90,13 +165,17 @@ T2 = tp.TypeVar("T2")
 class SharedPtr(Structure, tp.Generic[T]):
     size = 0x10
 
-    def __init__(self, addr: int, c1: tp.Type[T]):
+    def __init__(self, addr: int, c1: tp.Type[T], cached: bool = False):
         super().__init__(addr)
         self.c1 = c1
+        # Only for slots that change no more often than pointerGeneration() does
+        # (the Framework -> Player -> component chain); anything else, e.g. values in
+        # hash table nodes that get freed and reused, is read live.
+        self.cached = cached
 
     @property
     def value(self) -> tp.Optional[T]:
-        ptr = ctx.read_u64(self.addr)
+        ptr = ctx.read_ptr(self.addr) if self.cached else ctx.read_u64(self.addr)
         return self.c1(ptr) if ptr else None  # type: ignore
 
 
@@ -143,18 +222,80 @@ class HashTableNode(Structure, tp.Generic[T]):
         return class_(self.addr + 0x10)  # type: ignore
 
 
+class HashTableNodeData(tp.NamedTuple):
+    addr: int
+    next: int
+    hash: int
+    # The node's inline value
+    data: bytes
+
+
 class HashTable(Structure, tp.Generic[T]):
     """libc++ std::unordered_map (hash table)"""
 
+    # Bucket arrays longer than this are not used to seed a traversal.
+    MAX_SEED_BUCKETS = 0x4000
+
     def __init__(self, addr: int, class_: tp.Type[T]):
         super().__init__(addr)
         self.class_ = class_
+        self.valueSize: int = getattr(class_, "size", 0x20)
 
     def items(self) -> tp.Iterable[T]:
-        node = self.firstNode
-        while node:
-            yield node.value(self.class_)
-            node = node.next
+        for node in self.nodes():
+            yield self.class_(node.addr + 0x10)  # type: ignore
+
+    def nodes(self, seeds: tp.Optional[tp.Iterable[int]] = None) -> tp.List[HashTableNodeData]:
+        """Every node in iteration order, each read together with its value.
+
+        The bucket array holds the predecessor of each bucket's first node, so it
+        gives most node addresses up front; those are fetched in one batch and
+        each following batch only needs the next pointers not seen yet. Callers
+        that already know the node addresses (e.g. from a previous traversal) can
+        pass them as `seeds` to fetch them in the same request as the header.
+        """
+        nodeSize = 0x10 + self.valueSize
+        fetched: tp.Dict[int, HashTableNodeData] = {}
+
+        def store(addr: int, data: bytes) -> None:
+            next_, hash_ = struct.unpack_from("<QQ", data)
+            fetched[addr] = HashTableNodeData(addr, next_, hash_, data[0x10:])
+
+        if seeds is not None:
+            seeds = sorted(set(seeds))
+            header, *seedData = ctx.read_many([(self.addr, 0x20)] + [(addr, nodeSize) for addr in seeds])
+            for addr, data in zip(seeds, seedData):
+                store(addr, data)
+        else:
+            header = ctx.read(self.addr, 0x20)
+        buckets, bucketCount, first, count = struct.unpack("<QQQQ", header)
+        if not first:
+            return []
+
+        frontier = {first}
+        if seeds is not None:
+            frontier.update(node.next for node in fetched.values() if node.next)
+        elif buckets and 0 < bucketCount <= self.MAX_SEED_BUCKETS:
+            anchor = self.addr + 0x10
+            bucketSeeds = struct.unpack(f"<{bucketCount}Q", ctx.read(buckets, bucketCount * 8))
+            frontier.update(seed for seed in bucketSeeds if seed and seed != anchor)
+        frontier.difference_update(fetched)
+
+        limit = count + bucketCount + len(fetched) + 1
+        while frontier and len(fetched) <= limit:
+            batch = sorted(frontier)
+            for addr, data in zip(batch, ctx.read_many([(addr, nodeSize) for addr in batch])):
+                store(addr, data)
+            frontier = {fetched[addr].next for addr in batch if fetched[addr].next}
+            frontier.difference_update(fetched)
+
+        ordered = []
+        addr = first
+        while addr in fetched and len(ordered) < len(fetched):
+            node = fetched[addr]
+            ordered.append(node)
+            addr = node.next
+        return ordered
 
     @property
     def firstNode(self) -> tp.Optional[HashTableNode[T]]:
@@ -168,20 +309,25 @@ class HashTable(Structure, tp.Generic[T]):
 class Framework(Structure):
     @property
     def actorSystem(self) -> SharedPtr[ActorSystem]:
-        return SharedPtr(self.addr + 0x498, ActorSystem)
+        return SharedPtr(self.addr + 0x498, ActorSystem, cached=True)
 
     @property
     def gameState(self) -> SharedPtr[GameState]:
-        return SharedPtr(self.addr + 0x4A8, GameState)
+        return SharedPtr(self.addr + 0x4A8, GameState, cached=True)
 
     @property
     def player(self) -> SharedPtr[Player]:
-        return SharedPtr(self.addr + 0x4B8, Player)
+        return SharedPtr(self.addr + 0x4B8, Player, cached=True)
 
     @property
     def frameCount(self) -> int:
+        """Inside a tick this comes with the tick's other reads, so it matches them."""
         return ctx.read_u32(self.addr + 0x4D4)
 
+    def pollFrameCount(self) -> int:
+        """The current frame, read straight from the console."""
+        return ctx.read_u32(self.addr + 0x4D4, volatile=True)
+
 # forward declaration
 
 
@@ -206,10 +352,14 @@ class ActorId(Structure):
 
 class ActorSystem(Structure):
     class ActorMapValue(Pair[StringView, SharedPtr[Actor]]):
+        size = 0x20
+
         def __init__(self, addr: int):
             super().__init__(addr, StringView, makeTypeSharedPtr(Actor))
 
     class ActorByIdMapValue(Pair[ActorId, SharedPtr[Actor]]):
+        size = 0x18
+
         def __init__(self, addr: int):
             super().__init__(addr, ActorId, makeTypeSharedPtr(Actor))
 
@@ -230,6 +380,63 @@ class ActorSystem(Structure):
         return HashTable(self.addr + 0x60, self.ActorMapValue)
 
 
+class ActorIndex:
+    """Map objects of an ActorSystem indexed by id, name and actorIdx.
+
+    Built from one bulk traversal of mapObjects plus one batched read of every
+    actor's header, so lookups afterwards need no reads at all.
+    """
+
+    class Entry(tp.NamedTuple):
+        id: int
+        name: str
+        actorIdx: int
+        actor: Actor
+
+    # Entity.name, Actor.id and Actor.actorIdx all lie within this many bytes.
+    HEADER_SIZE = 0xA2
+
+    def __init__(self, actorSystem: ActorSystem) -> None:
+        self.actorSystem = actorSystem
+        self.entries: tp.List[ActorIndex.Entry] = []
+        self.byId: tp.Dict[int, ActorIndex.Entry] = {}
+        self.byName: tp.Dict[str, tp.List[ActorIndex.Entry]] = {}
+        self.byActorIdx: tp.Dict[int, ActorIndex.Entry] = {}
+
+        objects = []
+        for node in actorSystem.mapObjects.nodes():
+            objId, actorPtr = struct.unpack_from("<QQ", node.data)
+            if actorPtr:
+                objects.append((objId, actorPtr))
+        headers = ctx.read_many([(ptr, self.HEADER_SIZE) for _, ptr in objects])
+        for (objId, ptr), header in zip(objects, headers):
+            name = header[0x18:0x18 + 0x41].split(b"\x00", 1)[0].decode(errors="replace")
+            actorIdx, = struct.unpack_from("<H", header, 0xA0)
+            entry = ActorIndex.Entry(objId, name, actorIdx, Actor(ptr))
+            self.entries.append(entry)
+            self.byId[objId] = entry
+            self.byName.setdefault(name, []).append(entry)
+            self.byActorIdx[actorIdx] = entry
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self) -> tp.Iterator[ActorIndex.Entry]:
+        return iter(self.entries)
+
+    def findById(self, id: tp.Union[int, str]) -> tp.Optional[Actor]:
+        """Look up a map object by id, given as an int or as a hex string."""
+        entry = self.byId.get(int(id, 16) if isinstance(id, str) else id)
+        return entry.actor if entry else None
+
+    def findByName(self, name: str) -> tp.List[Actor]:
+        return [entry.actor for entry in self.byName.get(name, ())]
+
+    def findByActorIdx(self, actorIdx: int) -> tp.Optional[Actor]:
+        entry = self.byActorIdx.get(actorIdx)
+        return entry.actor if entry else None
+
+
 class GameState(VirtualStructure):
     @property
     def type(self) -> str:
@@ -251,6 +458,8 @@ class Entity(VirtualStructure):
 
 class Actor(Entity):  # type: ignore
     class ComponentMapValue(Pair[StringView, SharedPtr[DeferredInitComp]]):
+        size = 0x20
+
         def __init__(self, addr: int):
             super().__init__(addr, StringView, makeTypeSharedPtr(DeferredInitComp))
 
@@ -276,13 +485,17 @@ class Actor(Entity):  # type: ignore
 
 
 class Player(Actor):
+    @property
+    def rootComp(self) -> SharedPtr[RootComp]:
+        return SharedPtr(self.addr + 0x80, RootComp, cached=True)
+
     @property
     def skeletalModelComp(self) -> SharedPtr[RootComp]:
-        return SharedPtr(self.addr + 0x2A8, RootComp)
+        return SharedPtr(self.addr + 0x2A8, RootComp, cached=True)
 
     @property
     def playerCollision(self) -> SharedPtr[CharMovementComp]:
-        return SharedPtr(self.addr + 0x2D8, CharMovementComp)
+        return SharedPtr(self.addr + 0x2D8, CharMovementComp, cached=True)
 
     @property
     def respawnCoords(self) -> Coords:
@@ -301,6 +514,18 @@ class DeferredInitComp(Entity):  # type: ignore
 
 
 class RootComp(DeferredInitComp):
+    fields = (
+        Field("otherComp", 0x58, "Q"),
+        Field("coordsNewPos", 0x80, "3f"),
+        Field("coordsNewRotate", 0x90, "4f"),
+        Field("coordsNewScale", 0xA0, "3f"),
+        Field("coordsPos", 0xB0, "3f"),
+        Field("coordsRotate", 0xC0, "4f"),
+        Field("coordsScale", 0xD0, "3f"),
+        Field("needsCoordUpdate", 0xE0, "?"),
+        Field("attachInfo", 0x140, "Q"),
+    )
+
     @property
     def otherComp(self) -> SharedPtr[RootComp]:
         return SharedPtr(self.addr + 0x58, RootComp)
@@ -324,6 +549,13 @@ class RootComp(DeferredInitComp):
 
 
 class CharCtrlComp(RootComp):
+    fields = (
+        Field("vecA", 0x180, "3f"),
+        Field("vel", 0x190, "3f"),
+        Field("gravity", 0x1A0, "3f"),
+        Field("vecC", 0x1B0, "3f"),
+    )
+
     @property
     def vecA(self) -> Vec3:
         return Vec3(self.addr + 0x180)
@@ -419,6 +651,16 @@ class Hinox(Actor):
         mDamageReactionState = 16
         mDefenseReactionState = 17
 
+    fields = (
+        Field("state", 0xFF0 + 0xD, "B"),
+        Field("walkSpeed", 0x15E0, "f"),
+        Field("angleToPlayer", 0x15F0, "I"),
+        Field("sklModelComp", 0x1608, "Q"),
+        Field("attachR", 0x1688, "Q"),
+        Field("attachL", 0x1698, "Q"),
+        Field("attachedPlayer", 0x16D8, "?"),
+    )
+
     @property
     def state(self) -> Hinox.State:
         return Hinox.State(ctx.read_u8(self.addr + 0xFF0 + 0xD))
@@ -453,6 +695,15 @@ class Save240(Structure):
 
 
 class Save248(Structure):
+    fields = (
+        Field("levelName", 0x0, "64s"),
+        Field("setup", 0x40, "64s"),
+        Field("pos1", 0xC4, "3f"),
+        Field("pos2", 0xD0, "3f"),
+        Field("pos3", 0xDC, "3f"),
+        Field("zoneId", 0xEC, "I"),
+    )
+
     @property
     def levelName(self) -> str:
         return ctx.read_string(self.addr)
@@ -525,6 +776,20 @@ class Inventory(Structure):
         4: "Rooster"
     }
 
+    fields = (
+        Field("rupees", 0x80, "H"),
+        Field("health", 0x84, "B"),
+        Field("heartPieces", 0x90, "Q"),
+        Field("heartContainers", 0x98, "H"),
+        Field("tradeItem", 0x9A, "B"),
+        Field("companion", 0x9D, "B"),
+        Field("bombs", 0x9E, "B"),
+        Field("arrows", 0x9F, "B"),
+        Field("magicPowder", 0xA0, "B"),
+        Field("popCounter", 0xA4, "B"),
+        Field("acornCounter", 0xA5, "B"),
+    )
+
     @property
     def acornCounter(self) -> int:
         return ctx.read_u8(self.addr + 0xA5)
@@ -550,9 +815,8 @@ class Inventory(Structure):
         return Inventory.COMPANIONS[ctx.read_u8(self.addr + 0x9D)]
 
     def fullHeal(self) -> None:
-        hearts = 3
-        hearts += ctx.count_set_bits(ctx.read_u16(self.addr + 0x98))
-        hearts += ctx.count_set_bits(ctx.read_u64(self.addr + 0x90)) // 4
+        snap = self.snapshot()
+        hearts = 3 + ctx.count_set_bits(snap.heartContainers) + ctx.count_set_bits(snap.heartPieces) // 4
         ctx.write(self.addr + 0x84, size=1, data=(4 * hearts))
 
     def forceAcorn(self) -> None:
@@ -568,6 +832,7 @@ class Inventory(Structure):
         ctx.write(self.addr + 0x9A, size=1, data=13)
 
     def resourceRefill(self) -> None:
-        ctx.write(self.addr + 0x9E, size=1, data=60) # Bombs
-        ctx.write(self.addr + 0x9F, size=1, data=60) # Arrows
-        ctx.write(self.addr + 0xA0, size=1, data=40) # MagicPowder
+        with ctx.batch():
+            ctx.write(self.addr + 0x9E, size=1, data=60) # Bombs
+            ctx.write(self.addr + 0x9F, size=1, data=60) # Arrows
+            ctx.write(self.addr + 0xA0, size=1, data=40) # MagicPowder
@@ -0,0 +1,502 @@
+"""The Qt front end, imported only when the GUI is launched.
+
+`config` is the module with the entry definitions and settings (see main.py):
+EntryContext, getEntries, getTraceEntries, addWatches, addFreezes and the *_MS constants.
+"""
+from __future__ import annotations
+import dataclasses
+import os
+import sys
+import time
+import typing as tp
+
+import PySide6.QtCore as qt
+import PySide6.QtWidgets as qtw
+import pyqtgraph as pg
+
+from lasdbg.actorwatch import ActorEvent, ActorWatcher
+from lasdbg.context import instance as ctx
+from lasdbg.freeze import Freezer
+from lasdbg.history import PathHistory
+import lasdbg.connector as connection
+import lasdbg.metrics as metrics
+from lasdbg.recorder import TraceRecorder
+from lasdbg.sampler import FrameSampler, FrameStats, Sample
+from lasdbg.watch import Change, WatchEngine
+import lasdbg.game as game
+
+if tp.TYPE_CHECKING:
+    from main import Entry, EntryContext, PlotEntry, TraceEntry
+
+
+class Sampler(qt.QObject):
+    """Owns the EntryContext and polls the console on its own thread."""
+
+    # Emitted with a Sample holding one value string per entry.
+    sampled = qt.Signal(object)
+    # Emitted with a copy of the FrameStats after every sample.
+    statsUpdated = qt.Signal(object)
+    # Emitted with the list of ActorEvents found by a sample, if any.
+    actorEvents = qt.Signal(object)
+    # Emitted with the sampled frame and the watch Changes it found, if any.
+    watchChanges = qt.Signal(int, object)
+    # Emitted with one (x, z) or None per plot entry after every sample.
+    plotted = qt.Signal(object)
+
+    def __init__(self, config: tp.Any, frameSync: tp.Optional[bool] = None) -> None:
+        super().__init__()
+        self.config = config
+        if frameSync is None:
+            frameSync = config.FRAME_SYNC
+        self.interval = config.FRAME_POLL_MS if frameSync else config.SAMPLE_INTERVAL_MS
+        self.running = False
+        self.entryCtx = config.EntryContext()
+        self.entries: tp.List[Entry] = config.getEntries()
+        self.frameSampler = FrameSampler(lambda: game.getFramework().pollFrameCount(),
+                                         self.sampleEntries, frameSync)
+        self.traceEntries: tp.List[TraceEntry] = config.getTraceEntries()
+        self.recorder: tp.Optional[TraceRecorder] = None
+        self._traceValues: tp.List[tp.Any] = []
+        self.actorWatcher: tp.Optional[ActorWatcher] = None
+        self.watchEngine = WatchEngine()
+        config.addWatches(self.watchEngine, self.entryCtx)
+        self.freezer = Freezer()
+        self.plotEntries: tp.List[PlotEntry] = config.getPlotEntries()
+
+    @qt.Slot()
+    def start(self) -> None:
+        # Created here so the timer belongs to the sampler thread.
+        self.sampleTimer = qt.QTimer(self)
+        self.sampleTimer.timeout.connect(self.onSampleTimer)
+        self.sampleTimer.setTimerType(qt.Qt.TimerType.PreciseTimer)
+        self.sampleTimer.setInterval(self.interval)
+        self.sampleTimer.start()
+        self.freezeTimer = qt.QTimer(self)
+        self.freezeTimer.timeout.connect(self.onFreezeTimer)
+        self.freezeTimer.setInterval(self.config.FREEZE_INTERVAL_MS)
+
+    @qt.Slot()
+    def stop(self) -> None:
+        self.sampleTimer.stop()
+        self.freezeTimer.stop()
+
+    @qt.Slot(bool)
+    def setFrozen(self, frozen: bool) -> None:
+        self.freezer.clear()
+        if frozen:
+            self.config.addFreezes(self.freezer, self.entryCtx)
+            self.freezeTimer.start()
+        else:
+            self.freezeTimer.stop()
+
+    @qt.Slot()
+    def onFreezeTimer(self) -> None:
+        try:
+            self.freezer.poll()
+        except Exception as e:
+            pass
+            # print(e)
+
+    @qt.Slot(bool)
+    def setRunning(self, running: bool) -> None:
+        self.running = running
+
+    @qt.Slot(bool)
+    def setRecording(self, recording: bool) -> None:
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+        if recording:
+            path = os.path.join("traces", time.strftime("%Y%m%d-%H%M%S"))
+            self.recorder = TraceRecorder(path, [(entry.name, entry.dtype) for entry in self.traceEntries])
+
+    @qt.Slot(object)
+    def runTask(self, task: tp.Callable[[EntryContext], None]) -> None:
+        task(self.entryCtx)
+
+    def watchActors(self, frame: int) -> None:
+        actsys = self.entryCtx.actsys
+        if not actsys:
+            return
+        if self.actorWatcher is None:
+            self.actorWatcher = ActorWatcher(actsys)
+        elif self.actorWatcher.actorSystem.addr != actsys.addr:
+            self.actorWatcher.reset(actsys)
+        events = self.actorWatcher.poll(frame)
+        if events:
+            self.actorEvents.emit(events)
+
+    def sampleEntries(self) -> tp.Tuple[int, tp.Tuple[str, ...]]:
+        try:
+            self.entryCtx.update()
+            frame = self.entryCtx.frm.frameCount
+            try:
+                changes = self.watchEngine.poll()
+            except Exception as e:
+                changes = []
+                # print(e)
+            if changes:
+                self.watchChanges.emit(frame, changes)
+            if self.config.ACTOR_WATCH:
+                try:
+                    self.watchActors(frame)
+                except Exception as e:
+                    pass
+                    # print(e)
+            values = []
+            for entry in self.entries:
+                try:
+                    val = entry.get_value(self.entryCtx)
+                except Exception as e:
+                    val = "???"
+                    # print(e)
+                values.append(val)
+            if self.recorder:
+                self._traceValues = []
+                for tentry in self.traceEntries:
+                    try:
+                        tval = tentry.get_value(self.entryCtx)
+                    except Exception:
+                        tval = None
+                    self._traceValues.append(tval)
+            if self.plotEntries:
+                points = []
+                for pentry in self.plotEntries:
+                    try:
+                        point = pentry.get_value(self.entryCtx)
+                    except Exception:
+                        point = None
+                    points.append(point)
+                self.plotted.emit(points)
+            return frame, tuple(values)
+        finally:
+            # Close the tick even if a read raised, so the next one starts from fresh pages.
+            ctx.end_tick()
+
+    @qt.Slot()
+    def onSampleTimer(self) -> None:
+        if not self.running:
+            return
+
+        # ctx.break_process()
+
+        try:
+            sample = self.frameSampler.poll()
+        except Exception as e:
+            sample = None
+            # print(e)
+        if sample:
+            if self.recorder:
+                self.recorder.append(sample.frame, sample.timestamp, self._traceValues)
+            self.sampled.emit(sample)
+            self.statsUpdated.emit(dataclasses.replace(self.frameSampler.stats))
+
+        # ctx.continue_process()
+
+
+class EntryTableModel(qt.QAbstractTableModel):
+    HEADERS = ("Name", "Value")
+
+    def __init__(self, entries: tp.List[Entry], parent: tp.Optional[qt.QObject] = None) -> None:
+        super().__init__(parent)
+        self.entries = entries
+        self.values: tp.List[str] = [""] * len(entries)
+
+    def rowCount(self, parent=qt.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.entries)
+
+    def columnCount(self, parent=qt.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section: int, orientation, role=qt.Qt.ItemDataRole.DisplayRole):
+        if role == qt.Qt.ItemDataRole.DisplayRole and orientation == qt.Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index: qt.QModelIndex, role=qt.Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != qt.Qt.ItemDataRole.DisplayRole:
+            return None
+        if index.column() == 0:
+            return self.entries[index.row()].name
+        return self.values[index.row()]
+
+    def setValues(self, values: tp.Sequence[str]) -> None:
+        """Store a new sample, notifying views only about runs of rows that changed."""
+        row = 0
+        while row < len(values):
+            if values[row] == self.values[row]:
+                row += 1
+                continue
+            first = row
+            while row < len(values) and values[row] != self.values[row]:
+                self.values[row] = values[row]
+                row += 1
+            self.dataChanged.emit(self.index(first, 1), self.index(row - 1, 1),
+                                  [qt.Qt.ItemDataRole.DisplayRole])
+
+
+class MainWindow(qtw.QMainWindow):
+    runningChanged = qt.Signal(bool)
+    recordingChanged = qt.Signal(bool)
+    frozenChanged = qt.Signal(bool)
+    taskRequested = qt.Signal(object)
+
+    def __init__(self, config: tp.Any) -> None:
+        super().__init__()
+        self.config = config
+
+        self.setWindowTitle("LAS")
+
+        self.running = False
+        self.recording = False
+
+        self.sampler = Sampler(config)
+        self.entries: tp.List[Entry] = self.sampler.entries
+        self.model = EntryTableModel(self.entries, self)
+        self.plotEntries: tp.List[PlotEntry] = self.sampler.plotEntries
+        self.histories = [PathHistory(config.PLOT_HISTORY, config.PLOT_MAX_POINTS) for _ in self.plotEntries]
+        # History version each curve last showed
+        self.shownVersions = [-1] * len(self.plotEntries)
+        self.initLayout()
+        self.latest: tp.Optional[Sample] = None
+        self.shown: tp.Optional[Sample] = None
+
+        self.samplerThread = qt.QThread(self)
+        self.sampler.moveToThread(self.samplerThread)
+        self.samplerThread.started.connect(self.sampler.start)
+        self.samplerThread.finished.connect(self.sampler.stop)
+        self.sampler.sampled.connect(self.onSampled)
+        self.sampler.statsUpdated.connect(self.onStatsUpdated)
+        self.sampler.actorEvents.connect(self.onActorEvents)
+        self.sampler.plotted.connect(self.onPlotted)
+        self.sampler.watchChanges.connect(self.onWatchChanges)
+        self.runningChanged.connect(self.sampler.setRunning)
+        self.recordingChanged.connect(self.sampler.setRecording)
+        self.frozenChanged.connect(self.sampler.setFrozen)
+        self.taskRequested.connect(self.sampler.runTask)
+        self.samplerThread.start()
+
+        self.updateTimer = qt.QTimer(self)
+        self.updateTimer.timeout.connect(self.onUpdateTimer)
+        self.updateTimer.setInterval(config.UI_REFRESH_MS)
+        self.updateTimer.start()
+
+        self.transportLabel = qtw.QLabel()
+        self.statusBar().addPermanentWidget(self.transportLabel)
+        self.transportTimer = qt.QTimer(self)
+        self.transportTimer.timeout.connect(self.onTransportTimer)
+        self.transportTimer.start(config.TRANSPORT_STATS_MS)
+        self.transportDump = metrics.PeriodicDump(connection.transportStats, config.TRANSPORT_STATS_PATH,
+                                                  config.TRANSPORT_STATS_MS / 1000) if config.TRANSPORT_STATS_PATH else None
+
+        self.plotTimer = qt.QTimer(self)
+        self.plotTimer.timeout.connect(self.onPlotTimer)
+        self.plotTimer.start(config.PLOT_REFRESH_MS)
+
+    def closeEvent(self, event) -> None:
+        self.samplerThread.quit()
+        self.samplerThread.wait()
+        # The thread has stopped, so the recorder can be closed from here.
+        self.sampler.setRecording(False)
+        if self.transportDump:
+            self.transportDump.stop()
+        super().closeEvent(event)
+
+    @qt.Slot(object)
+    def onSampled(self, sample: Sample) -> None:
+        self.latest = sample
+
+    @qt.Slot(object)
+    def onActorEvents(self, events: tp.List[ActorEvent]) -> None:
+        for event in events:
+            print(f"[{event.frame}] {event.kind} {event.table} {event.key} @ {event.actor:x}")
+
+    @qt.Slot(int, object)
+    def onWatchChanges(self, frame: int, changes: tp.List[Change]) -> None:
+        for change in changes:
+            print(f"[{frame}] {change.watch.name}: {change.old} -> {change.new}")
+
+    @qt.Slot(object)
+    def onStatsUpdated(self, stats: FrameStats) -> None:
+        self.statusBar().showMessage(str(stats))
+
+    @qt.Slot()
+    def onTransportTimer(self) -> None:
+        self.transportLabel.setText(connection.transportStats.summary())
+
+    @qt.Slot()
+    def onUpdateTimer(self) -> None:
+        if self.latest is None or self.latest is self.shown:
+            return
+        self.shown = self.latest
+        self.model.setValues(self.shown.values)
+
+    @qt.Slot(object)
+    def onPlotted(self, points: tp.List[tp.Optional[tp.Tuple[float, float]]]) -> None:
+        for history, point in zip(self.histories, points):
+            if point is not None:
+                history.append(*point)
+
+    @qt.Slot()
+    def onPlotTimer(self) -> None:
+        # Only curves whose history changed are redrawn, each from a bounded view.
+        for i, (history, curve) in enumerate(zip(self.histories, self.curves)):
+            if history.version != self.shownVersions[i]:
+                self.shownVersions[i] = history.version
+                curve.setData(*history.view())
+
+    @qt.Slot()
+    def onRunBtnPressed(self) -> None:
+        if self.running:
+            self.runBtn.setText("Continue")
+            # ctx.break_process()
+        else:
+            self.runBtn.setText("Break")
+            # ctx.ingest_events()
+            # ctx.continue_process()
+        self.running = not self.running
+        self.runningChanged.emit(self.running)
+
+    @qt.Slot()
+    def onRecordBtnPressed(self) -> None:
+        self.recording = not self.recording
+        self.recordBtn.setText("Stop Recording" if self.recording else "Record Trace")
+        self.recordingChanged.emit(self.recording)
+
+    @qt.Slot(bool)
+    def onFreezeToggled(self, frozen: bool) -> None:
+        self.frozenChanged.emit(frozen)
+
+    @qt.Slot()
+    def onClearGraphPressed(self) -> None:
+        for history in self.histories:
+            history.clear()
+
+    # @qt.Slot()
+    # def onFindHinoxPressed(self) -> None:
+    #     self.taskRequested.emit(lambda ectx: setattr(ectx, "shouldFindHinox", True))
+
+    @qt.Slot()
+    def onHealPressed(self) -> None:
+        def heal(ectx: EntryContext) -> None:
+            inventory = ectx.save.inventory
+            inventory.fullHeal()
+        self.taskRequested.emit(heal)
+        # player = self.entryCtx.player
+        # if not player:
+        #     return
+        # rootComp = player.rootComp.value
+        # print(ctx.read(rootComp.coords.addr, 0x30))
+        # if not rootComp:
+        #     return
+        # ctx.write(rootComp.coordsNew.addr, ctx.read(rootComp.coords.addr, 0x30))
+        # # ctx.write(rootComp.coordsNew.pos.addr, struct.pack('<f', 500))
+        # # ctx.write(rootComp.coordsNew.pos.addr + 4, struct.pack('<f', 500))
+        # # ctx.write(rootComp.coordsNew.pos.addr + 8, struct.pack('<f', 500))
+
+    @qt.Slot()
+    def onForcePopPressed(self) -> None:
+        def forcePop(ectx: EntryContext) -> None:
+            inventory = ectx.save.inventory
+            inventory.forcePop()
+        self.taskRequested.emit(forcePop)
+        # player = self.entryCtx.player
+        # if not player:
+        #     return
+        # rootComp = player.rootComp.value
+        # if not rootComp:
+        #     return
+        # ctx.write(rootComp.coordsNew.pos.addr, struct.pack('<f', 38))
+        # ctx.write(rootComp.coordsNew.pos.addr + 4, struct.pack('<f', 0))
+        # ctx.write(rootComp.coordsNew.pos.addr + 8, struct.pack('<f', 72))
+
+        # ctx.write(rootComp.coordsNew.pos.addr, struct.pack('<f', 17))
+        # ctx.write(rootComp.coordsNew.pos.addr + 4, struct.pack('<f', 0.5))
+        # ctx.write(rootComp.coordsNew.pos.addr + 8, struct.pack('<f', 43))
+
+        # ctx.write(rootComp.coordsNew.pos.addr, struct.pack('<f', 130))
+        # ctx.write(rootComp.coordsNew.pos.addr + 4, struct.pack('<f', 5))
+        # ctx.write(rootComp.coordsNew.pos.addr + 8, struct.pack('<f', 20))
+
+    @qt.Slot()
+    def onRefillPressed(self) -> None:
+        def refill(ectx: EntryContext) -> None:
+            inventory = ectx.save.inventory
+            inventory.resourceRefill()
+        self.taskRequested.emit(refill)
+
+    @qt.Slot()
+    def onTestPressed(self) -> None:
+        def test(ectx: EntryContext) -> None:
+            save = ectx.save
+            print(save.eventFlags.x248.levelName)
+            print(save.eventFlags.x248.setup)
+        self.taskRequested.emit(test)
+
+    def initLayout(self) -> None:
+        buttonsLayout = qtw.QHBoxLayout()
+        self.runBtn = qtw.QPushButton("Monitor Stats")
+        self.runBtn.pressed.connect(self.onRunBtnPressed)
+        buttonsLayout.addWidget(self.runBtn)
+        self.recordBtn = qtw.QPushButton("Record Trace")
+        self.recordBtn.pressed.connect(self.onRecordBtnPressed)
+        buttonsLayout.addWidget(self.recordBtn)
+        clearGraphBtn = qtw.QPushButton("Clear graph")
+        clearGraphBtn.pressed.connect(self.onClearGraphPressed)
+        buttonsLayout.addWidget(clearGraphBtn)
+        # findHinoxBtn = qtw.QPushButton("Find Hinox")
+        # findHinoxBtn.pressed.connect(self.onFindHinoxPressed)
+        # buttonsLayout.addWidget(findHinoxBtn)
+        testBtn = qtw.QPushButton("Full Heal")
+        testBtn.pressed.connect(self.onHealPressed)
+        buttonsLayout.addWidget(testBtn)
+        testBtn = qtw.QPushButton("Force PoP")
+        testBtn.pressed.connect(self.onForcePopPressed)
+        buttonsLayout.addWidget(testBtn)
+        testBtn = qtw.QPushButton("Refill Bombs/Arrows/Powder")
+        testBtn.pressed.connect(self.onRefillPressed)
+        buttonsLayout.addWidget(testBtn)
+        self.freezeBtn = qtw.QPushButton("Freeze Values")
+        self.freezeBtn.setCheckable(True)
+        self.freezeBtn.toggled.connect(self.onFreezeToggled)
+        buttonsLayout.addWidget(self.freezeBtn)
+        testBtn = qtw.QPushButton("Test")
+        testBtn.pressed.connect(self.onTestPressed)
+        buttonsLayout.addWidget(testBtn)
+
+        left = qtw.QVBoxLayout()
+        self.table = qtw.QTableView(self)
+        self.table.setModel(self.model)
+        self.table.horizontalHeader().setSectionResizeMode(0, qtw.QHeaderView.Stretch)
+        self.table.horizontalHeader().setSectionResizeMode(1, qtw.QHeaderView.Stretch)
+        self.table.verticalHeader().hide()
+        left.addLayout(buttonsLayout)
+        left.addWidget(self.table)
+
+        self.graph = pg.PlotWidget(self)
+        self.graph.showGrid(x=True, y=True)
+        self.graph.setLabel("left", "z")
+        self.graph.setLabel("bottom", "x")
+        # Top-down view: z grows downwards.
+        self.graph.invertY(True)
+        self.graph.addLegend()
+        self.curves = [self.graph.plot(name=pentry.name, pen=pg.mkPen(color=pentry.color, width=3))
+                       for pentry in self.plotEntries]
+        for curve in self.curves:
+            curve.setSkipFiniteCheck(True)
+
+        hbox = qtw.QHBoxLayout()
+        hbox.addLayout(left, stretch=3)
+        if self.plotEntries:
+            hbox.addWidget(self.graph, stretch=7)
+
+        widget = qtw.QWidget(self)
+        widget.setLayout(hbox)
+        self.setCentralWidget(widget)
+
+
+def run(config: tp.Any) -> None:
+    app = qtw.QApplication([])
+    win = MainWindow(config)
+    win.show()
+    sys.exit(app.exec())
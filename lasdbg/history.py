@@ -0,0 +1,77 @@
+import typing as tp
+
+import numpy as np
+
+
+class PathHistory:
+    """The last `capacity` points of a 2D path in fixed-size ring buffers.
+
+    view() returns at most about `maxPoints` points however long the history is:
+    the most recent points at full resolution, everything older min/max decimated.
+    Every `bucket` points are reduced once, when the bucket fills, to the points
+    holding its smallest and largest x and y, so excursions stay visible and each
+    view costs O(maxPoints) rather than O(capacity).
+    """
+
+    def __init__(self, capacity: int = 1 << 20, maxPoints: int = 8192) -> None:
+        self.maxPoints = maxPoints
+        # Decimated buckets take up at most half of a view.
+        self.bucket = max(1, -(-8 * capacity // maxPoints))
+        self.capacity = capacity // self.bucket * self.bucket
+        self.x = np.zeros(self.capacity, np.float32)
+        self.y = np.zeros(self.capacity, np.float32)
+        self.buckets = self.capacity // self.bucket
+        self.decimated = np.zeros((self.buckets, 2, 4), np.float32)
+        self.count = 0
+        # Bumped on every change, so views can be skipped when nothing happened.
+        self.version = 0
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def clear(self) -> None:
+        self.count = 0
+        self.version += 1
+
+    def append(self, x: float, y: float) -> None:
+        i = self.count % self.capacity
+        self.x[i] = x
+        self.y[i] = y
+        self.count += 1
+        self.version += 1
+        if self.count % self.bucket == 0:
+            self._reduce(self.count // self.bucket - 1)
+
+    def _reduce(self, b: int) -> None:
+        start = b * self.bucket % self.capacity
+        x = self.x[start:start + self.bucket]
+        y = self.y[start:start + self.bucket]
+        keep = np.sort([x.argmin(), x.argmax(), y.argmin(), y.argmax()])
+        self.decimated[b % self.buckets] = (x[keep], y[keep])
+
+    def _raw(self, first: int, last: int) -> tp.Tuple[np.ndarray, np.ndarray]:
+        """Points [first, last) in order; both are absolute point numbers."""
+        if first >= last:
+            return self.x[:0], self.y[:0]
+        lo, hi = first % self.capacity, (last - 1) % self.capacity + 1
+        if lo < hi:
+            return self.x[lo:hi], self.y[lo:hi]
+        return np.concatenate((self.x[lo:], self.x[:hi])), np.concatenate((self.y[lo:], self.y[:hi]))
+
+    def view(self) -> tp.Tuple[np.ndarray, np.ndarray]:
+        first = max(0, self.count - self.capacity)
+        if self.count - first <= self.maxPoints:
+            return self._raw(first, self.count)
+        # Whole buckets before the full-resolution tail
+        firstBucket = -(-first // self.bucket)
+        endBucket = (self.count - self.maxPoints // 2) // self.bucket
+        tail = self._raw(endBucket * self.bucket, self.count)
+        lo, hi = firstBucket % self.buckets, (endBucket - 1) % self.buckets + 1
+        if endBucket <= firstBucket:
+            return tail
+        if lo < hi:
+            old = self.decimated[lo:hi]
+        else:
+            old = np.concatenate((self.decimated[lo:], self.decimated[:hi]))
+        return (np.concatenate((old[:, 0].reshape(-1), tail[0])),
+                np.concatenate((old[:, 1].reshape(-1), tail[1])))
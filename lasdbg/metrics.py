@@ -0,0 +1,132 @@
+import bisect
+import dataclasses
+import json
+import threading
+import time
+import typing as tp
+
+
+class Histogram:
+    """Latency histogram over log-spaced buckets, from 10 µs to about 10 s in ~19% steps."""
+
+    BOUNDS = [1e-5 * 2 ** (i / 4) for i in range(81)]
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p: float) -> float:
+        """Upper bound of the bucket holding the p-th percentile (0 < p <= 100)."""
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(self.BOUNDS[i], self.max) if i < len(self.BOUNDS) else self.max
+        return self.max
+
+
+@dataclasses.dataclass
+class CommandStats:
+    count: int = 0
+    bytesSent: int = 0
+    bytesReceived: int = 0
+    # Time spent turning replies into bytes, as opposed to waiting for them.
+    decodeSeconds: float = 0.0
+    latency: Histogram = dataclasses.field(default_factory=Histogram)
+
+    def asDict(self) -> tp.Dict[str, tp.Any]:
+        return {
+            "count": self.count,
+            "bytesSent": self.bytesSent,
+            "bytesReceived": self.bytesReceived,
+            "decodeSeconds": self.decodeSeconds,
+            "latencyTotal": self.latency.total,
+            "p50": self.latency.percentile(50),
+            "p95": self.latency.percentile(95),
+            "p99": self.latency.percentile(99),
+            "max": self.latency.max,
+        }
+
+
+class TransportStats:
+    """Per command counts, bytes and latency of everything sent to sys-botbase.
+
+    Latency runs from sending a command to receiving all of its reply; commands
+    without a reply record only the time taken to send them. Thread-safe.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.commands: tp.Dict[str, CommandStats] = {}
+        self.since = time.time()
+
+    def record(self, command: str, sent: int, received: int, seconds: float, decodeSeconds: float = 0.0) -> None:
+        with self._lock:
+            stats = self.commands.get(command)
+            if stats is None:
+                stats = self.commands[command] = CommandStats()
+            stats.count += 1
+            stats.bytesSent += sent
+            stats.bytesReceived += received
+            stats.decodeSeconds += decodeSeconds
+            stats.latency.add(seconds)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.commands = {}
+            self.since = time.time()
+
+    def snapshot(self) -> tp.Dict[str, tp.Any]:
+        with self._lock:
+            return {
+                "time": time.time(),
+                "since": self.since,
+                "commands": {name: stats.asDict() for name, stats in self.commands.items()},
+            }
+
+    def summary(self) -> str:
+        """One line for the status bar: totals and the p50/p99 of every command."""
+        with self._lock:
+            sent = sum(s.bytesSent for s in self.commands.values())
+            received = sum(s.bytesReceived for s in self.commands.values())
+            parts = [f"{name} {s.count}× p50 {s.latency.percentile(50) * 1e3:.1f} "
+                     f"p99 {s.latency.percentile(99) * 1e3:.1f} ms"
+                     for name, s in sorted(self.commands.items())]
+        return f"tx {sent / 1024:.0f} KiB rx {received / 1024:.0f} KiB | " + " | ".join(parts)
+
+
+class PeriodicDump:
+    """Appends a JSON snapshot of a TransportStats to a JSON Lines file every `interval` seconds."""
+
+    def __init__(self, stats: TransportStats, path: str, interval: float = 10.0) -> None:
+        self.stats = stats
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="transport-stats", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.dump()
+
+    def dump(self) -> None:
+        with open(self.path, "a") as f:
+            f.write(json.dumps(self.stats.snapshot()) + "\n")
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.dump()
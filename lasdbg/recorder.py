@@ -0,0 +1,112 @@
+import json
+import os
+import typing as tp
+
+import numpy as np
+
+_META = "meta.json"
+
+
+def _columnFile(index: int) -> str:
+    return f"col{index:03d}.bin"
+
+
+class TraceRecorder:
+    """Records one row per sample into a fixed-size ring buffer, one array per column.
+
+    Every `chunkRows` rows the unflushed part of the ring is appended to one raw
+    file per column, so memory use stays bounded however long the recording runs.
+    """
+
+    def __init__(self, path: str, columns: tp.Sequence[tp.Tuple[str, tp.Any]],
+                 chunkRows: int = 4096, capacity: int = 4 * 4096) -> None:
+        assert capacity >= chunkRows
+        os.makedirs(path, exist_ok=False)
+        self.path = path
+        self.chunkRows = chunkRows
+        self.capacity = capacity
+        self.names = ["frame", "timestamp"] + [name for name, _ in columns]
+        self.dtypes = [np.dtype("<u4"), np.dtype("<f8")] + [np.dtype(dtype).newbyteorder("<") for _, dtype in columns]
+        self.buffers = [np.zeros(capacity, dtype) for dtype in self.dtypes]
+        self.fill = [np.nan if dtype.kind == "f" else 0 for dtype in self.dtypes]
+        self.rows = 0
+        self.flushed = 0
+        self._files = [open(os.path.join(path, _columnFile(i)), "ab") for i in range(len(self.names))]
+        self._writeMeta()
+
+    def _writeMeta(self) -> None:
+        meta = {
+            "columns": [{"name": name, "dtype": dtype.str, "file": _columnFile(i)}
+                        for i, (name, dtype) in enumerate(zip(self.names, self.dtypes))],
+            "rows": self.flushed,
+        }
+        tmp = os.path.join(self.path, _META + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f, indent=1)
+        os.replace(tmp, os.path.join(self.path, _META))
+
+    def append(self, frame: int, timestamp: float, values: tp.Sequence[tp.Any]) -> None:
+        i = self.rows % self.capacity
+        self.buffers[0][i] = frame
+        self.buffers[1][i] = timestamp
+        for col, (buf, value) in enumerate(zip(self.buffers[2:], values), 2):
+            buf[i] = self.fill[col] if value is None else value
+        self.rows += 1
+        if self.rows - self.flushed >= self.chunkRows:
+            self.flush()
+
+    def _spans(self, first: int, last: int) -> tp.Iterator[slice]:
+        """Ring slices covering rows [first, last)."""
+        while first < last:
+            start = first % self.capacity
+            end = min(self.capacity, start + last - first)
+            yield slice(start, end)
+            first += end - start
+
+    def flush(self) -> None:
+        if self.rows == self.flushed:
+            return
+        for buf, f in zip(self.buffers, self._files):
+            for span in self._spans(self.flushed, self.rows):
+                buf[span].tofile(f)
+            f.flush()
+        self.flushed = self.rows
+        self._writeMeta()
+
+    def recent(self, count: int) -> tp.Dict[str, np.ndarray]:
+        """Copies of the last `count` rows still held in memory, by column name."""
+        count = min(count, self.rows, self.capacity)
+        return {name: np.concatenate([buf[span] for span in self._spans(self.rows - count, self.rows)])
+                for name, buf in zip(self.names, self.buffers)}
+
+    def close(self) -> None:
+        self.flush()
+        for f in self._files:
+            f.close()
+
+
+class TraceReader:
+    """Memory-maps a recorded trace; columns are loaded lazily by the OS."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(os.path.join(path, _META)) as f:
+            self.meta = json.load(f)
+        self.rows = self.meta["rows"]
+        self._columns: tp.Dict[str, tp.Tuple[str, np.dtype]] = {
+            col["name"]: (os.path.join(path, col["file"]), np.dtype(col["dtype"]))
+            for col in self.meta["columns"]
+        }
+
+    @property
+    def names(self) -> tp.List[str]:
+        return list(self._columns)
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        file, dtype = self._columns[name]
+        if self.rows == 0:
+            return np.zeros(0, dtype)
+        return np.memmap(file, dtype=dtype, mode="r", shape=(self.rows,))
@@ -0,0 +1,174 @@
+import json
+import mmap
+import os
+import struct
+import typing as tp
+
+import lasdbg.connector as connection
+
+# Capture files are a sequence of records: kind (u8), addr (u64), size (u32), data.
+_RECORD = struct.Struct("<BQI")
+READ, WRITE, TICK = range(3)
+CAPTURE_EXT = ".lascap"
+
+
+class RecordingBackend:
+    """Wraps a live backend and appends every read, write and tick to a capture file."""
+
+    def __init__(self, inner, path: str) -> None:
+        self.inner = inner
+        self.path = path
+        self._file = open(path, "ab")
+
+    @property
+    def dead(self) -> bool:
+        return getattr(self.inner, "dead", False)
+
+    def _record(self, kind: int, addr: int, data: bytes = b"") -> None:
+        self._file.write(_RECORD.pack(kind, addr, len(data)))
+        self._file.write(data)
+
+    def beginTick(self) -> None:
+        self._record(TICK, 0)
+        self._file.flush()
+
+    def readMemory(self, addr: int, size: int) -> bytes:
+        data = self.inner.readMemory(addr, size)
+        self._record(READ, addr, data)
+        return data
+
+    def readMany(self, ranges: tp.Sequence[tp.Tuple[int, int]]) -> tp.List[bytes]:
+        blocks = self.inner.readMany(ranges)
+        for (addr, _), data in zip(ranges, blocks):
+            self._record(READ, addr, data)
+        return blocks
+
+    def writeMemory(self, addr: int, size: int, value) -> None:
+        self.inner.writeMemory(addr, size, value)
+        self._record(WRITE, addr, connection.valueBytes(size, value))
+
+    def writeMany(self, writes: tp.Sequence[tp.Tuple[int, bytes]]) -> None:
+        self.inner.writeMany(writes)
+        for addr, data in writes:
+            self._record(WRITE, addr, data)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ReplayBackend:
+    """Serves reads from snapshots and capture files instead of a console.
+
+    Memory is the most recent captured data, falling back to snapshots and then to
+    zeros. Each beginTick() (called by Context.begin_tick) replays one more tick of
+    every capture. Writes are applied locally and kept in `writes`.
+    """
+
+    PAGE_SIZE = 0x1000
+
+    def __init__(self, paths: tp.Iterable[str] = ()) -> None:
+        self._pages: tp.Dict[int, bytearray] = {}
+        self._snapshots: tp.List[tp.Tuple[int, int, mmap.mmap]] = []
+        self._captures: tp.List[tp.BinaryIO] = []
+        self.writes: tp.List[tp.Tuple[int, bytes]] = []
+        self.tick = 0
+        # Bytes read that no snapshot or capture covered.
+        self.unmapped = 0
+        for path in paths:
+            self.add(path)
+
+    def add(self, path: str) -> None:
+        """Add a snapshot (by base path or its .bin/.json), a capture, or a directory of them."""
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith(".json") or name.endswith(CAPTURE_EXT):
+                    self.add(os.path.join(path, name))
+        elif path.endswith(CAPTURE_EXT):
+            self._captures.append(open(path, "rb"))
+        else:
+            base = os.path.splitext(path)[0] if path.endswith((".bin", ".json")) else path
+            with open(base + ".json") as f:
+                meta = json.load(f)
+            with open(base + ".bin", "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._snapshots.append((meta["addr"], meta["size"], data))
+
+    def _fill(self, addr: int, size: int) -> bytearray:
+        out = bytearray(size)
+        covered = 0
+        for start, length, data in self._snapshots:
+            lo, hi = max(addr, start), min(addr + size, start + length)
+            if lo < hi:
+                out[lo - addr:hi - addr] = data[lo - start:hi - start]
+                covered += hi - lo
+        self.unmapped += max(0, size - covered)
+        return out
+
+    def _store(self, addr: int, data: bytes) -> None:
+        ps = self.PAGE_SIZE
+        offset = 0
+        while offset < len(data):
+            page = (addr + offset) // ps
+            buf = self._pages.get(page)
+            if buf is None:
+                buf = self._pages[page] = self._fill(page * ps, ps)
+            start = (addr + offset) % ps
+            n = min(ps - start, len(data) - offset)
+            buf[start:start + n] = data[offset:offset + n]
+            offset += n
+
+    def beginTick(self) -> None:
+        # Replays everything up to (not including) the marker of the tick after this one.
+        for f in self._captures:
+            started = False
+            while True:
+                header = f.read(_RECORD.size)
+                if len(header) < _RECORD.size:
+                    break
+                kind, addr, size = _RECORD.unpack(header)
+                if kind == TICK:
+                    if started:
+                        f.seek(-_RECORD.size, os.SEEK_CUR)
+                        break
+                    started = True
+                    continue
+                data = f.read(size)
+                # Writes were made by the tool; the reads that follow show whether they took.
+                if kind == READ:
+                    self._store(addr, data)
+        self.tick += 1
+
+    def rewind(self) -> None:
+        for f in self._captures:
+            f.seek(0)
+        self._pages.clear()
+        self.writes.clear()
+        self.tick = 0
+
+    def readMemory(self, addr: int, size: int) -> bytes:
+        ps = self.PAGE_SIZE
+        out = bytearray()
+        offset = 0
+        while offset < size:
+            page = (addr + offset) // ps
+            start = (addr + offset) % ps
+            n = min(ps - start, size - offset)
+            buf = self._pages.get(page)
+            if buf is not None:
+                out += buf[start:start + n]
+            else:
+                out += self._fill(addr + offset, n)
+            offset += n
+        return bytes(out)
+
+    def readMany(self, ranges: tp.Sequence[tp.Tuple[int, int]]) -> tp.List[bytes]:
+        return [self.readMemory(addr, size) for addr, size in ranges]
+
+    def writeMemory(self, addr: int, size: int, value) -> None:
+        data = connection.valueBytes(size, value)
+        self.writes.append((addr, data))
+        self._store(addr, data)
+
+    def writeMany(self, writes: tp.Sequence[tp.Tuple[int, bytes]]) -> None:
+        for addr, data in writes:
+            self.writeMemory(addr, len(data), data)
@@ -0,0 +1,72 @@
+import collections
+import dataclasses
+import time
+import typing as tp
+
+_FRAME_MASK = 0xFFFFFFFF
+
+
+class Sample(tp.NamedTuple):
+    frame: int
+    timestamp: float
+    values: tp.Tuple[tp.Any, ...]
+
+
+@dataclasses.dataclass
+class FrameStats:
+    samples: int = 0
+    # Frames that passed between two samples without being sampled.
+    dropped: int = 0
+    # Samples taken on a frame that had already been sampled.
+    duplicated: int = 0
+    lastFrame: tp.Optional[int] = None
+    rate: float = 0.0
+
+    def __str__(self) -> str:
+        return (f"Frame {self.lastFrame} | {self.rate:.1f} Hz | "
+                f"dropped {self.dropped} | duplicated {self.duplicated}")
+
+
+class FrameSampler:
+    """Samples once per game frame, keyed on Framework.frameCount.
+
+    sample() returns the frame along with the values, read in the same tick so the
+    frame is the one the values belong to. With frameSync, readFrame() is polled
+    first and nothing is sampled until the frame has advanced; with it off, poll()
+    samples on every call and only reports frames that were missed or seen twice.
+    """
+
+    def __init__(self, readFrame: tp.Callable[[], int],
+                 sample: tp.Callable[[], tp.Tuple[int, tp.Tuple[tp.Any, ...]]],
+                 frameSync: bool = True, rateWindow: int = 120) -> None:
+        self.readFrame = readFrame
+        self.sample = sample
+        self.frameSync = frameSync
+        self.stats = FrameStats()
+        self._times: tp.Deque[float] = collections.deque(maxlen=rateWindow)
+
+    def reset(self) -> None:
+        self.stats = FrameStats()
+        self._times.clear()
+
+    def poll(self) -> tp.Optional[Sample]:
+        last = self.stats.lastFrame
+        # Costs a round trip of its own, so only when gating on the frame.
+        if self.frameSync and last is not None and self.readFrame() == last:
+            return None
+
+        frame, values = self.sample()
+        if last is not None:
+            delta = (frame - last) & _FRAME_MASK
+            if delta == 0:
+                self.stats.duplicated += 1
+            elif delta < 0x80000000:
+                self.stats.dropped += delta - 1
+            # Otherwise the counter went backwards, e.g. after a reload; nothing was missed.
+        now = time.perf_counter()
+        self._times.append(now)
+        self.stats.samples += 1
+        self.stats.lastFrame = frame
+        if len(self._times) > 1:
+            self.stats.rate = (len(self._times) - 1) / (self._times[-1] - self._times[0])
+        return Sample(frame, now, values)
@@ -0,0 +1,164 @@
+import typing as tp
+
+import numpy as np
+
+from lasdbg.context import instance as ctx
+
+TYPES = {
+    "u8": np.dtype("<u1"),
+    "u16": np.dtype("<u2"),
+    "u32": np.dtype("<u4"),
+    "s32": np.dtype("<i4"),
+    "u64": np.dtype("<u8"),
+    "f32": np.dtype("<f4"),
+    "f64": np.dtype("<f8"),
+}
+
+MODES = ("equal", "range", "changed", "unchanged", "increased", "decreased")
+
+
+class Scanner:
+    """Value scanner over [start, start + size), narrowed by repeated scans.
+
+    Candidates are kept as u32 offsets from `start` with their last seen values,
+    so millions of them fit in a few tens of MB. A scan with no initial value keeps
+    the whole region instead, until the first narrowing scan turns it into
+    explicit candidates.
+    """
+
+    def __init__(self, start: int, size: int, type: str = "u32", align: tp.Optional[int] = None,
+                 chunkSize: int = 0x400000, gap: int = 0x100) -> None:
+        assert size < 1 << 32, "offsets are stored as u32"
+        self.start = start
+        self.size = size
+        self.dtype = TYPES[type]
+        self.align = align or self.dtype.itemsize
+        # Regions are dumped this many bytes at a time.
+        self.chunkSize = chunkSize - chunkSize % self.dtype.itemsize
+        # Candidates closer than this are re-read as one range.
+        self.gap = gap
+        self.offsets: tp.Optional[np.ndarray] = None
+        self.values: tp.Optional[np.ndarray] = None
+        # Per chunk values, for a first scan without a value.
+        self._unknown: tp.Optional[tp.List[np.ndarray]] = None
+
+    def __len__(self) -> int:
+        if self._unknown is not None:
+            return sum(len(values) for values in self._unknown)
+        return 0 if self.offsets is None else len(self.offsets)
+
+    def _chunks(self) -> tp.Iterator[tp.Tuple[int, bytearray]]:
+        for offset in range(0, self.size, self.chunkSize):
+            data = ctx.dump_region(self.start + offset, min(self.chunkSize, self.size - offset))
+            yield offset, data  # type: ignore
+
+    def _view(self, data: bytes, shift: int) -> np.ndarray:
+        count = (len(data) - shift) // self.dtype.itemsize
+        return np.frombuffer(data, self.dtype, count, shift)
+
+    def _compare(self, mode: str, old: tp.Optional[np.ndarray], new: np.ndarray,
+                 value=None, high=None, tolerance: float = 0.0) -> np.ndarray:
+        if mode == "equal":
+            if self.dtype.kind == "f":
+                return np.abs(new - value) <= tolerance
+            return new == value
+        if mode == "range":
+            return (new >= value) & (new <= high)
+        assert old is not None, f"{mode} needs a previous scan"
+        if mode == "changed":
+            return new != old
+        if mode == "unchanged":
+            return new == old
+        if mode == "increased":
+            return new > old
+        if mode == "decreased":
+            return new < old
+        raise ValueError(f"unknown scan mode {mode!r}; expected one of {MODES}")
+
+    def firstScan(self, mode: tp.Optional[str] = None, value=None, high=None, tolerance: float = 0.0) -> int:
+        """Start over. mode is "equal" or "range", or None to remember every value."""
+        self.offsets = self.values = None
+        self._unknown = None
+        if mode is None:
+            assert self.align == self.dtype.itemsize, "unknown value scans need natural alignment"
+            self._unknown = [self._view(data, 0).copy() for _, data in self._chunks()]
+            return len(self)
+
+        offsets, values = [], []
+        for base, data in self._chunks():
+            for shift in range(0, self.dtype.itemsize, self.align):
+                view = self._view(data, shift)
+                hits = np.flatnonzero(self._compare(mode, None, view, value, high, tolerance))
+                offsets.append((base + shift + hits * self.dtype.itemsize).astype(np.uint32))
+                values.append(view[hits])
+        self.offsets = np.concatenate(offsets) if offsets else np.zeros(0, np.uint32)
+        self.values = np.concatenate(values) if values else np.zeros(0, self.dtype)
+        order = np.argsort(self.offsets, kind="stable")
+        self.offsets, self.values = self.offsets[order], self.values[order]
+        return len(self)
+
+    def _readCandidates(self, offsets: np.ndarray, batchRanges: int = 512) -> np.ndarray:
+        """Current values at the given sorted offsets, read as merged ranges in batches."""
+        size = self.dtype.itemsize
+        out = np.empty(len(offsets), self.dtype)
+        if not len(offsets):
+            return out
+        # Neighbouring candidates share a range, but no range crosses a chunk boundary.
+        cut = (np.diff(offsets.astype(np.int64)) > self.gap + size) | (np.diff(offsets // self.chunkSize) != 0)
+        breaks = np.flatnonzero(cut) + 1
+        groupFirst = np.r_[0, breaks]
+        groupLast = np.r_[breaks - 1, len(offsets) - 1]
+        starts = offsets[groupFirst].astype(np.int64)
+        lengths = offsets[groupLast].astype(np.int64) + size - starts
+        lengthList = lengths.tolist()
+
+        g0 = 0
+        while g0 < len(starts):
+            g1 = g0 + 1
+            total = lengthList[g0]
+            while g1 < len(starts) and g1 - g0 < batchRanges and total + lengthList[g1] <= self.chunkSize:
+                total += lengthList[g1]
+                g1 += 1
+            ranges = [(self.start + int(start), length) for start, length in zip(starts[g0:g1], lengthList[g0:g1])]
+            if len(ranges) == 1 and total > self.chunkSize // 4:
+                blocks = [ctx.dump_region(*ranges[0])]
+            else:
+                blocks = ctx.read_many(ranges)
+            buf = np.frombuffer(b"".join(blocks), np.uint8)
+
+            # Position of every candidate of these groups within buf
+            bases = np.r_[0, np.cumsum(lengths[g0:g1])[:-1]]
+            groups = np.repeat(np.arange(g1 - g0), groupLast[g0:g1] - groupFirst[g0:g1] + 1)
+            first, last = groupFirst[g0], groupLast[g1 - 1] + 1
+            pos = bases[groups] + offsets[first:last] - starts[g0:g1][groups]
+            out[first:last] = buf[pos[:, None] + np.arange(size)].view(self.dtype).reshape(-1)
+            g0 = g1
+        return out
+
+    def nextScan(self, mode: str, value=None, high=None, tolerance: float = 0.0) -> int:
+        """Keep the candidates whose current value satisfies mode; returns how many are left."""
+        if self._unknown is not None:
+            offsets, values = [], []
+            for (base, data), old in zip(self._chunks(), self._unknown):
+                new = self._view(data, 0)
+                hits = np.flatnonzero(self._compare(mode, old, new, value, high, tolerance))
+                offsets.append((base + hits * self.dtype.itemsize).astype(np.uint32))
+                values.append(new[hits])
+            self._unknown = None
+            self.offsets = np.concatenate(offsets)
+            self.values = np.concatenate(values)
+            return len(self)
+
+        assert self.offsets is not None, "firstScan has not been run"
+        new = self._readCandidates(self.offsets)
+        keep = self._compare(mode, self.values, new, value, high, tolerance)
+        self.offsets = self.offsets[keep]
+        self.values = new[keep]
+        return len(self)
+
+    def results(self, limit: int = 100) -> tp.List[tp.Tuple[int, tp.Any]]:
+        """(address, last seen value) of the first `limit` candidates."""
+        if self.offsets is None:
+            return []
+        return [(self.start + int(offset), value.item())
+                for offset, value in zip(self.offsets[:limit], self.values[:limit])]  # type: ignore
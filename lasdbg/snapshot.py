@@ -0,0 +1,111 @@
+import json
+import time
+import typing as tp
+
+import numpy as np
+
+from lasdbg.context import instance as ctx
+
+# Types a changed range is shown as, each over the range widened to 4-byte alignment.
+DIFF_TYPES = {
+    "u8": np.dtype("<u1"),
+    "u16": np.dtype("<u2"),
+    "u32": np.dtype("<u4"),
+    "s32": np.dtype("<i4"),
+    "f32": np.dtype("<f4"),
+}
+
+
+class Snapshot:
+    """A region of memory saved as raw bytes (name.bin) with a JSON header (name.json).
+
+    The data is memory-mapped on first access, so opening a snapshot costs nothing
+    and diffs only page in what they touch.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path + ".json") as f:
+            self.meta = json.load(f)
+        self.addr: int = self.meta["addr"]
+        self.size: int = self.meta["size"]
+        self.label: str = self.meta.get("label", "")
+        self._data: tp.Optional[np.memmap] = None
+
+    @classmethod
+    def capture(cls, path: str, addr: int, size: int, label: str = "") -> "Snapshot":
+        ctx.dump_region(addr, size, path + ".bin")
+        with open(path + ".json", "w") as f:
+            json.dump({"addr": addr, "size": size, "label": label, "time": time.time()}, f, indent=1)
+        return cls(path)
+
+    @property
+    def data(self) -> np.ndarray:
+        if self._data is None:
+            self._data = np.memmap(self.path + ".bin", np.uint8, "r", shape=(self.size,))
+        return self._data
+
+    def read(self, addr: int, size: int) -> bytes:
+        return self.data[addr - self.addr:addr - self.addr + size].tobytes()
+
+    def __repr__(self) -> str:
+        return f"Snapshot({self.path!r}, {self.addr:#x}, {self.size:#x})"
+
+
+class DiffRange(tp.NamedTuple):
+    # First and one-past-last changed byte
+    addr: int
+    end: int
+    # Old and new bytes of the range widened to 4-byte alignment, starting at `aligned`
+    aligned: int
+    old: bytes
+    new: bytes
+
+    def values(self) -> tp.Dict[str, tp.Tuple[tp.Tuple[tp.Any, ...], tp.Tuple[tp.Any, ...]]]:
+        """The widened range as (old, new) tuples of every DIFF_TYPES type."""
+        result = {}
+        for name, dtype in DIFF_TYPES.items():
+            n = len(self.old) // dtype.itemsize * dtype.itemsize
+            result[name] = (tuple(np.frombuffer(self.old[:n], dtype).tolist()),
+                            tuple(np.frombuffer(self.new[:n], dtype).tolist()))
+        return result
+
+    def __str__(self) -> str:
+        lines = [f"{self.addr:#x}..{self.end:#x} ({self.end - self.addr} bytes)"]
+        for name, (old, new) in self.values().items():
+            lines.append(f"  {name:>4}: {old} -> {new}")
+        return "\n".join(lines)
+
+
+def diff(a: Snapshot, b: Snapshot, gap: int = 4, chunkSize: int = 0x1000000) -> tp.List[DiffRange]:
+    """Changed byte ranges over the overlap of two snapshots.
+
+    Changes separated by at most `gap` unchanged bytes are reported as one range.
+    """
+    start = max(a.addr, b.addr)
+    end = min(a.addr + a.size, b.addr + b.size)
+    runs: tp.List[tp.List[int]] = []
+    for chunk in range(start, end, chunkSize):
+        n = min(chunkSize, end - chunk)
+        old = a.data[chunk - a.addr:chunk - a.addr + n]
+        new = b.data[chunk - b.addr:chunk - b.addr + n]
+        changed = np.flatnonzero(old != new)
+        if not len(changed):
+            continue
+        breaks = np.flatnonzero(np.diff(changed) > gap) + 1
+        firsts = (changed[np.r_[0, breaks]] + chunk).tolist()
+        lasts = (changed[np.r_[breaks - 1, len(changed) - 1]] + chunk + 1).tolist()
+        for first, last in zip(firsts, lasts):
+            # Runs may continue across a chunk boundary.
+            if runs and first - runs[-1][1] <= gap:
+                runs[-1][1] = last
+            else:
+                runs.append([first, last])
+
+    ranges = []
+    for first, last in runs:
+        aligned = max(start, first & ~3)
+        alignedEnd = min(end, (last + 3) & ~3)
+        ranges.append(DiffRange(first, last, aligned,
+                                a.read(aligned, alignedEnd - aligned), b.read(aligned, alignedEnd - aligned)))
+    return ranges
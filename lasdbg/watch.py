@@ -0,0 +1,168 @@
+from __future__ import annotations
+import bisect
+import struct
+import typing as tp
+
+from lasdbg.context import instance as ctx, merge_ranges
+import lasdbg.game as game
+
+TYPES = {
+    "bool": "?",
+    "u8": "B",
+    "s8": "b",
+    "u16": "<H",
+    "s16": "<h",
+    "u32": "<I",
+    "s32": "<i",
+    "u64": "<Q",
+    "s64": "<q",
+    "f32": "<f",
+    "f64": "<d",
+}
+
+Condition = tp.Callable[[tp.Any, tp.Any], bool]
+
+
+def equals(value) -> Condition:
+    return lambda old, new: new == value
+
+
+def greaterThan(value) -> Condition:
+    return lambda old, new: new > value
+
+
+def lessThan(value) -> Condition:
+    return lambda old, new: new < value
+
+
+def bitSet(bit: int) -> Condition:
+    return lambda old, new: bool(new & (1 << bit))
+
+
+def layoutField(obj: game.Structure, field: str) -> game.Field:
+    layout = obj.layout
+    match = [f for f in layout.fields if f.name == field] if layout else []
+    if not match:
+        raise KeyError(f"{type(obj).__name__} has no layout field {field!r}")
+    return match[0]
+
+
+def resolvePath(root: tp.Any, path: str) -> tp.Tuple[game.Structure, game.Field]:
+    """The object and layout field a dotted path such as "inventory.health" leads to.
+
+    Every component but the last is followed as an attribute (SharedPtrs through
+    their value); the last must be a layout field.
+    """
+    *parents, field = path.split(".")
+    obj = root
+    for part in parents:
+        obj = getattr(obj, part)
+        if isinstance(obj, game.SharedPtr):
+            obj = obj.value
+        if obj is None:
+            raise LookupError(f"{path}: {part} is null")
+    return obj, layoutField(obj, field)
+
+
+class Watch:
+    def __init__(self, name: str, addr: int, fmt: str, condition: tp.Optional[Condition] = None,
+                 callback: tp.Optional[tp.Callable[[Change], None]] = None) -> None:
+        self.name = name
+        self.addr = addr
+        self.struct = struct.Struct(fmt if fmt[0] in "<>=!@" else "<" + fmt)
+        self.condition = condition
+        self.callback = callback
+
+    @property
+    def size(self) -> int:
+        return self.struct.size
+
+    def decode(self, data: bytes) -> tp.Any:
+        values = self.struct.unpack(data)
+        return values[0] if len(values) == 1 else values
+
+    def __repr__(self) -> str:
+        return f"Watch({self.name!r}, {self.addr:#x}, {self.struct.format!r})"
+
+
+class Change(tp.NamedTuple):
+    watch: Watch
+    old: tp.Any
+    new: tp.Any
+
+
+class WatchEngine:
+    """Polls many watched values with one batched read and reports only changes.
+
+    Previous values are kept as raw bytes in one buffer, so a poll in which nothing
+    changed costs a single comparison.
+    """
+
+    def __init__(self, gap: int = 0x40) -> None:
+        # Watches closer than this many bytes are read as one range.
+        self.gap = gap
+        self.watches: tp.List[Watch] = []
+        self.listeners: tp.List[tp.Callable[[Change], None]] = []
+        self._ranges: tp.List[tp.Tuple[int, int]] = []
+        # Per watch: index of its range, offset within it, offset in _prev
+        self._slots: tp.List[tp.Tuple[int, int, int]] = []
+        self._prev: tp.Optional[bytes] = None
+
+    def _rebuild(self) -> None:
+        self._ranges = merge_ranges(((w.addr, w.size) for w in self.watches), self.gap)
+        starts = [addr for addr, _ in self._ranges]
+        self._slots = []
+        pos = 0
+        for w in self.watches:
+            i = bisect.bisect_right(starts, w.addr) - 1
+            self._slots.append((i, w.addr - starts[i], pos))
+            pos += w.size
+        self._prev = None
+
+    def watch(self, addr: int, type: str = "u32", name: tp.Optional[str] = None, **kwargs) -> Watch:
+        """Watch a value of one of the TYPES (or any struct format) at addr."""
+        w = Watch(name or f"{addr:#x}", addr, TYPES.get(type, type), **kwargs)
+        self.watches.append(w)
+        self._rebuild()
+        return w
+
+    def watchField(self, obj: game.Structure, field: str, name: tp.Optional[str] = None, **kwargs) -> Watch:
+        """Watch a field declared in the layout of obj's class."""
+        f = layoutField(obj, field)
+        return self.watch(obj.addr + f.offset, f.fmt, name or f"{type(obj).__name__}.{field}", **kwargs)
+
+    def watchPath(self, root: tp.Any, path: str, **kwargs) -> Watch:
+        """Watch a dotted path (see resolvePath) starting from root. The address is resolved once."""
+        obj, field = resolvePath(root, path)
+        kwargs.setdefault("name", path)
+        return self.watchField(obj, field.name, **kwargs)
+
+    def remove(self, w: Watch) -> None:
+        self.watches.remove(w)
+        self._rebuild()
+
+    def poll(self) -> tp.List[Change]:
+        if not self.watches:
+            return []
+        blocks = ctx.read_many(self._ranges)
+        current = b"".join(blocks[i][offset:offset + w.size]
+                           for w, (i, offset, _) in zip(self.watches, self._slots))
+        prev, self._prev = self._prev, current
+        if prev is None or prev == current:
+            return []
+
+        changes = []
+        for w, (_, _, pos) in zip(self.watches, self._slots):
+            oldData = prev[pos:pos + w.size]
+            newData = current[pos:pos + w.size]
+            if oldData == newData:
+                continue
+            change = Change(w, w.decode(oldData), w.decode(newData))
+            if w.condition and not w.condition(change.old, change.new):
+                continue
+            changes.append(change)
+            if w.callback:
+                w.callback(change)
+            for listener in self.listeners:
+                listener(change)
+        return changes
@@ -1,16 +1,11 @@
 from __future__ import annotations
 import dataclasses
 import sys
-import struct
-import time
 import typing as tp
 
-# from pyqtgraph import PlotWidget, plot
-# import pyqtgraph as pg
-import PySide6.QtCore as qt
-import PySide6.QtWidgets as qtw
-
 from lasdbg.context import instance as ctx
+from lasdbg.freeze import Freezer
+from lasdbg.watch import WatchEngine
 import lasdbg.game as game
 
 GAME_TICK_CALC = 0x7100017E30
@@ -21,34 +16,64 @@ class Entry(tp.NamedTuple):
     get_value: tp.Callable[[EntryContext], str]
 
 
+class TraceEntry(tp.NamedTuple):
+    name: str
+    dtype: str
+    get_value: tp.Callable[[EntryContext], tp.Union[int, float]]
+
+
 class PlotEntry(tp.NamedTuple):
     name: str
+    # (x, z) of a position, drawn as a top-down path
     get_value: tp.Callable[[EntryContext], tp.Tuple[float, float]]
-    pen: tp.Any
+    color: tp.Tuple[int, int, int]
 
 
 @dataclasses.dataclass
 class EntryContext:
-    save: game.GlobalSave = game.GlobalSave(ctx.addr(game.Addresses.GlobalSave))
+    save: game.GlobalSave = dataclasses.field(
+        default_factory=lambda: game.GlobalSave(ctx.addr(game.Addresses.GlobalSave)))
 
-    frm: game.Framework = game.getFramework()
+    frm: game.Framework = dataclasses.field(default_factory=game.getFramework)
     player: tp.Optional[game.Player] = None
     actsys: tp.Optional[game.ActorSystem] = None
 
     hinox: tp.Optional[game.Hinox] = None
     shouldFindHinox: bool = False
 
+    # Rebuilt on demand after the pointer generation changes (e.g. a new zone)
+    actorIndex: tp.Optional[game.ActorIndex] = None
+    generation: tp.Optional[tp.Hashable] = None
+    # Update count when actorIndex was built, so a lookup miss rebuilds it at most once per update
+    actorIndexBuilt: int = -1
+
     _i = 0
 
-    def findMapObject(self, id: str) -> tp.Optional[game.Actor]:
+    def getActorIndex(self, rebuild: bool = False) -> tp.Optional[game.ActorIndex]:
         if not self.actsys:
             return None
-        for id_, actor in self.actsys.mapObjects.items():
-            if str(id_).upper() == id:
-                return actor.value
-        return None
+        if rebuild or self.actorIndex is None or self.actorIndex.actorSystem.addr != self.actsys.addr:
+            self.actorIndex = game.ActorIndex(self.actsys)
+            self.actorIndexBuilt = self._i
+        return self.actorIndex
+
+    def findMapObject(self, id: str) -> tp.Optional[game.Actor]:
+        index = self.getActorIndex()
+        if index is None:
+            return None
+        actor = index.findById(id)
+        if actor is None and self.actorIndexBuilt != self._i:
+            # The object may have spawned since the index was built.
+            actor = self.getActorIndex(rebuild=True).findById(id)
+        return actor
 
     def update(self) -> None:
+        ctx.begin_tick()
+        generation = game.pointerGeneration()
+        if generation != self.generation:
+            self.generation = generation
+            self.actorIndex = None
+        ctx.set_pointer_generation(generation)
         self.frm = game.getFramework()
         self.player = self.frm.player.value
         self.actsys = self.frm.actorSystem.value
@@ -72,6 +97,8 @@ def getEntries() -> tp.List[Entry]:
     entries.append(Entry("Trade Item", lambda ectx: str(ectx.save.inventory.tradeItem)))
     entries.append(Entry("Companion", lambda ectx: str(ectx.save.inventory.companion)))
 
+    # entries.append(Entry("Read cache (last tick)", lambda ectx: str(ctx.last_tick_stats)))
+    # entries.append(Entry("Pointer cache", lambda ectx: str(ctx.pointer_stats)))
     # entries.append(Entry("Frame", lambda ectx: str(str(ectx.frm.frameCount))))
     # entries.append(Entry("Number of actors", lambda ectx: str(len(ectx.actsys.actors))))
     # entries.append(Entry("Number of map objects", lambda ectx: str(len(ectx.actsys.mapObjects))))
@@ -149,217 +176,75 @@ def getEntries() -> tp.List[Entry]:
     return entries
 
 
-# def getPlotEntries() -> tp.List[PlotEntry]:
-#     entries = []
-
-#     def vec3_to_vec2(vec3):
-#         v = vec3.data
-#         return (v[0], v[2])
-
-#     entries.append(PlotEntry("Player - Respawn pos",
-#                              lambda ectx: vec3_to_vec2(
-#                                  ectx.player.respawnCoords.pos),
-#                              pen=pg.mkPen(color=(255, 0, 0), width=3)))
-
-#     entries.append(PlotEntry("Player - SklMdlComp pos",
-#                              lambda ectx: vec3_to_vec2(ectx.player.skeletalModelComp.value.coords.pos), pen=pg.mkPen(color=(0, 0, 255), width=3)))
-
-#     entries.append(PlotEntry("Player - Collision posNew",
-#                              lambda ectx: vec3_to_vec2(
-#                                  ectx.player.playerCollision.value.coords.pos),
-#                              pen=pg.mkPen(color=(255, 255, 0), width=3)))
-
-#     entries.append(PlotEntry("Player - Collision pos",
-#                              lambda ectx: vec3_to_vec2(
-#                                  ectx.player.playerCollision.value.coords.pos),
-#                              pen=pg.mkPen(color=(255, 255, 255), width=3)))
-
-#     entries.append(PlotEntry("RootComp.a.tgCoords.pos", lambda ectx: vec3_to_vec2(
-#         ectx.player.rootComp.value.attachInfo.targetCoords.pos), pen=pg.mkPen(color=(0, 255, 255), width=3)))
-
-#     return entries
-
-
-class MainWindow(qtw.QMainWindow):
-    def __init__(self) -> None:
-        super().__init__()
-
-        self.setWindowTitle("LAS")
-        self.initLayout()
-
-        self.running = False
-
-        self.entryCtx = EntryContext()
-        self.entries: tp.List[Entry] = getEntries()
-        # self.plotEntries: tp.List[PlotEntry] = getPlotEntries()
-        # self.plots: tp.List[tp.Tuple[list, list]] = []
-        # for i in range(len(self.plotEntries)):
-        #     self.plots.append(([], []))
-
-        self.updateTimer = qt.QTimer(self)
-        self.updateTimer.timeout.connect(self.onUpdateTimer)
-        self.updateTimer.setTimerType(qt.Qt.TimerType.PreciseTimer)
-        self.updateTimer.setInterval(3000)
-        self.updateTimer.start()
-
-        # self.plotTimer = qt.QTimer(self)
-        # self.plotTimer.timeout.connect(self.onPlotTimer)
-        # self.plotTimer.start(100)
-
-    @qt.Slot()
-    def onUpdateTimer(self) -> None:
-        if not self.running:
-            return
-
-        # ctx.break_process()
-
-        self.entryCtx.update()
-        self.table.setRowCount(len(self.entries))
-        for i, entry in enumerate(self.entries):
-            item = qtw.QTableWidgetItem(entry.name)
-            self.table.setItem(i, 0, item)
-
-            try:
-                val = entry.get_value(self.entryCtx)
-            except Exception as e:
-                val = "???"
-                # print(e)
-            item = qtw.QTableWidgetItem(val)
-            self.table.setItem(i, 1, item)
-
-        # for i, pentry in enumerate(self.plotEntries):
-        #     try:
-        #         x, y = pentry.get_value(self.entryCtx)
-        #         self.plots[i][0].append(x)
-        #         self.plots[i][1].append(-y)
-        #     except:
-        #         pass
-
-        # ctx.continue_process()
-
-    # @qt.Slot()
-    # def onPlotTimer(self) -> None:
-    #     self.graph.clear()
-    #     for i, pentry in enumerate(self.plotEntries):
-    #         self.graph.plot(self.plots[i][0], self.plots[i][1], pen=pentry.pen)
-
-    @qt.Slot()
-    def onRunBtnPressed(self) -> None:
-        if self.running:
-            self.runBtn.setText("Continue")
-            # ctx.break_process()
-        else:
-            self.runBtn.setText("Break")
-            # ctx.ingest_events()
-            # ctx.continue_process()
-        self.running = not self.running
-
-    # @qt.Slot()
-    # def onClearGraphPressed(self) -> None:
-    #     for lx, ly in self.plots:
-    #         lx.clear()
-    #         ly.clear()
-    #     self.graph.clear()
-
-    # @qt.Slot()
-    # def onFindHinoxPressed(self) -> None:
-    #     self.entryCtx.shouldFindHinox = True
-
-    @qt.Slot()
-    def onHealPressed(self) -> None:
-        inventory = self.entryCtx.save.inventory
-        inventory.fullHeal()
-        # player = self.entryCtx.player
-        # if not player:
-        #     return
-        # rootComp = player.rootComp.value
-        # print(ctx.read(rootComp.coords.addr, 0x30))
-        # if not rootComp:
-        #     return
-        # ctx.write(rootComp.coordsNew.addr, ctx.read(rootComp.coords.addr, 0x30))
-        # # ctx.write(rootComp.coordsNew.pos.addr, struct.pack('<f', 500))
-        # # ctx.write(rootComp.coordsNew.pos.addr + 4, struct.pack('<f', 500))
-        # # ctx.write(rootComp.coordsNew.pos.addr + 8, struct.pack('<f', 500))
-
-    @qt.Slot()
-    def onForcePopPressed(self) -> None:
-        inventory = self.entryCtx.save.inventory
-        inventory.forcePop()
-        # player = self.entryCtx.player
-        # if not player:
-        #     return
-        # rootComp = player.rootComp.value
-        # if not rootComp:
-        #     return
-        # ctx.write(rootComp.coordsNew.pos.addr, struct.pack('<f', 38))
-        # ctx.write(rootComp.coordsNew.pos.addr + 4, struct.pack('<f', 0))
-        # ctx.write(rootComp.coordsNew.pos.addr + 8, struct.pack('<f', 72))
-
-        # ctx.write(rootComp.coordsNew.pos.addr, struct.pack('<f', 17))
-        # ctx.write(rootComp.coordsNew.pos.addr + 4, struct.pack('<f', 0.5))
-        # ctx.write(rootComp.coordsNew.pos.addr + 8, struct.pack('<f', 43))
-
-        # ctx.write(rootComp.coordsNew.pos.addr, struct.pack('<f', 130))
-        # ctx.write(rootComp.coordsNew.pos.addr + 4, struct.pack('<f', 5))
-        # ctx.write(rootComp.coordsNew.pos.addr + 8, struct.pack('<f', 20))
-
-    @qt.Slot()
-    def onRefillPressed(self) -> None:
-        inventory = self.entryCtx.save.inventory
-        inventory.resourceRefill()
-
-    @qt.Slot()
-    def onTestPressed(self) -> None:
-        save = self.entryCtx.save
-        print(save.eventFlags.x248.levelName)
-        print(save.eventFlags.x248.setup)
-
-    def initLayout(self) -> None:
-        buttonsLayout = qtw.QHBoxLayout()
-        self.runBtn = qtw.QPushButton("Monitor Stats")
-        self.runBtn.pressed.connect(self.onRunBtnPressed)
-        buttonsLayout.addWidget(self.runBtn)
-        # clearGraphBtn = qtw.QPushButton("Clear graph")
-        # clearGraphBtn.pressed.connect(self.onClearGraphPressed)
-        # buttonsLayout.addWidget(clearGraphBtn)
-        # findHinoxBtn = qtw.QPushButton("Find Hinox")
-        # findHinoxBtn.pressed.connect(self.onFindHinoxPressed)
-        # buttonsLayout.addWidget(findHinoxBtn)
-        testBtn = qtw.QPushButton("Full Heal")
-        testBtn.pressed.connect(self.onHealPressed)
-        buttonsLayout.addWidget(testBtn)
-        testBtn = qtw.QPushButton("Force PoP")
-        testBtn.pressed.connect(self.onForcePopPressed)
-        buttonsLayout.addWidget(testBtn)
-        testBtn = qtw.QPushButton("Refill Bombs/Arrows/Powder")
-        testBtn.pressed.connect(self.onRefillPressed)
-        buttonsLayout.addWidget(testBtn)
-        testBtn = qtw.QPushButton("Test")
-        testBtn.pressed.connect(self.onTestPressed)
-        buttonsLayout.addWidget(testBtn)
-
-        left = qtw.QVBoxLayout()
-        self.table = qtw.QTableWidget(self)
-        self.table.setColumnCount(2)
-        self.table.setHorizontalHeaderLabels(["Name", "Value"])
-        self.table.horizontalHeader().setSectionResizeMode(0, qtw.QHeaderView.Stretch)
-        self.table.horizontalHeader().setSectionResizeMode(1, qtw.QHeaderView.Stretch)
-        self.table.verticalHeader().hide()
-        left.addLayout(buttonsLayout)
-        left.addWidget(self.table)
-
-        # self.graph = pg.PlotWidget(self)
-        # self.graph.showGrid(x=True, y=True)
-        # self.graph.setLabel("left", "y")
-        # self.graph.setLabel("bottom", "x")
-
-        hbox = qtw.QHBoxLayout()
-        hbox.addLayout(left, stretch=3)
-        # hbox.addWidget(self.graph, stretch=7)
-
-        widget = qtw.QWidget(self)
-        widget.setLayout(hbox)
-        self.setCentralWidget(widget)
+def addWatches(engine: WatchEngine, ectx: EntryContext) -> None:
+    engine.watchPath(ectx.save, "inventory.popCounter")
+    engine.watchPath(ectx.save, "eventFlags.x248.zoneId")
+    # import lasdbg.watch as watch
+    # engine.watchPath(ectx.save, "inventory.health", condition=watch.lessThan(4))
+    # engine.watch(ectx.frm.addr + 0x4D4, "u32", name="frameCount")
+
+
+def addFreezes(freezer: Freezer, ectx: EntryContext) -> None:
+    freezer.freezePath(ectx, "save.inventory.bombs", 60)
+    freezer.freezePath(ectx, "save.inventory.arrows", 60)
+    freezer.freezePath(ectx, "save.inventory.magicPowder", 40)
+    # freezer.freezePath(ectx, "save.inventory.health", 4 * 3)
+    # freezer.freezePath(ectx, "save.inventory.popCounter", 52)
+
+
+def getTraceEntries() -> tp.List[TraceEntry]:
+    entries = []
+
+    def vec3_entries(name: str, get_vec3: tp.Callable[[EntryContext], game.Vec3]) -> tp.List[TraceEntry]:
+        return [TraceEntry(f"{name}.{axis}", "f4", lambda ectx, i=i: get_vec3(ectx).data[i])
+                for i, axis in enumerate("xyz")]
+
+    entries.append(TraceEntry("Health", "u1", lambda ectx: ectx.save.inventory.health))
+    entries.append(TraceEntry("Rupees", "u2", lambda ectx: ectx.save.inventory.rupees))
+    entries.append(TraceEntry("Pop Counter", "u1", lambda ectx: ectx.save.inventory.popCounter))
+    entries.append(TraceEntry("Acorn Counter", "u1", lambda ectx: ectx.save.inventory.acornCounter))
+    entries += vec3_entries("Player - Actor spawn pos", lambda ectx: ectx.player.spawnCoords.pos)
+    # entries += vec3_entries("Player - Respawn pos", lambda ectx: ectx.player.respawnCoords.pos)
+    # entries += vec3_entries("Player - Collision pos",
+    #                         lambda ectx: ectx.player.playerCollision.value.coords.pos)
+
+    return entries
+
+
+def getPlotEntries() -> tp.List[PlotEntry]:
+    entries = []
+
+    def xz(vec3: game.Vec3) -> tp.Tuple[float, float]:
+        x, _, z = vec3.data
+        return x, z
+
+    entries.append(PlotEntry("Player - Respawn pos", lambda ectx: xz(ectx.player.respawnCoords.pos), (255, 0, 0)))
+    entries.append(PlotEntry("Player - SklMdlComp pos",
+                             lambda ectx: xz(ectx.player.skeletalModelComp.value.coords.pos), (0, 0, 255)))
+    entries.append(PlotEntry("Player - Collision pos",
+                             lambda ectx: xz(ectx.player.playerCollision.value.coords.pos), (255, 255, 0)))
+    # entries.append(PlotEntry("RootComp.a.tgCoords.pos",
+    #                          lambda ectx: xz(ectx.player.rootComp.value.attachInfo.targetCoords.pos), (0, 255, 255)))
+
+    return entries
+
+
+SAMPLE_INTERVAL_MS = 3000
+UI_REFRESH_MS = 100
+# Sample once per game frame instead of every SAMPLE_INTERVAL_MS.
+FRAME_SYNC = False
+FRAME_POLL_MS = 4
+# Report actor spawns/despawns on every sample.
+ACTOR_WATCH = False
+# Plot refresh rate, points kept per plotted path and points drawn per path at most.
+PLOT_REFRESH_MS = 100
+PLOT_HISTORY = 1 << 20
+PLOT_MAX_POINTS = 8192
+# How often frozen values are checked and restored.
+FREEZE_INTERVAL_MS = 50
+# Transport stats readout in the status bar; also appended to this JSON Lines file if set.
+TRANSPORT_STATS_MS = 1000
+TRANSPORT_STATS_PATH: tp.Optional[str] = None
 
 
 # def fg() -> None:
@@ -374,34 +259,36 @@ class MainWindow(qtw.QMainWindow):
 def main() -> None:
     # print(f"base: {ctx.base:016x}")
 
-    app = qtw.QApplication([])
-    win = MainWindow()
-    win.show()
-    sys.exit(app.exec())
+    # PySide6 is only needed from here on.
+    import lasdbg.gui as gui
+    gui.run(sys.modules[__name__])
 
 
-main()
 
-frm = game.Framework(ctx.read_u64(ctx.addr(game.Addresses.FrameworkPtr)))
-gameState = frm.gameState.value
-assert gameState
-print(f"{ctx.to_ida(ctx.read_u64(gameState.addr)):016x}")
-player = frm.player.value
+def explore() -> None:
+    frm = game.Framework(ctx.read_u64(ctx.addr(game.Addresses.FrameworkPtr)))
+    gameState = frm.gameState.value
+    assert gameState
+    print(f"{ctx.to_ida(ctx.read_u64(gameState.addr)):016x}")
+    player = frm.player.value
 
-print(len(player.components))
-for name, comp in player.components.items():
-    print(name)
+    print(len(player.components))
+    for name, comp in player.components.items():
+        print(name)
 
-actorSystem = frm.actorSystem.value
-assert actorSystem
+    actorSystem = frm.actorSystem.value
+    assert actorSystem
+    print_actors(actorSystem)
 
 
-def print_actors() -> None:
-    assert actorSystem
+def print_actors(actorSystem: game.ActorSystem) -> None:
     print("============ map1 ============")
     for name, actor in actorSystem.actors.items():
         print(name)
     print("============ map objects ============")
-    for objid, actor in actorSystem.mapObjects.items():
-        name = actor.value.name
-        print(objid, name)
+    for entry in game.ActorIndex(actorSystem):
+        print("%016x" % entry.id, entry.name)
+
+
+if __name__ == "__main__":
+    main()